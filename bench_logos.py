@@ -0,0 +1,825 @@
+#!/usr/bin/env python3
+"""
+Logo Processor Benchmarks
+- Times every public stage of process_logos.py on a deterministic synthetic corpus
+- Appends each run to a JSON history file
+- Compares runs and flags slowdowns beyond a threshold
+- Generates large synthetic corpora and measures end-to-end scaling with --jobs
+- Studies encoder settings on the processed logos and reports the size/time Pareto frontier
+- Checks the edge-connected flood fill against a BFS and times it against global background removal on 4K logos
+- Checks that rerunning the pipeline on unchanged logos is fully cached
+"""
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import PIL
+from PIL import Image, ImageDraw, features
+
+import process_logos as pl
+
+HISTORY_PATH = "bench_history.json"
+REPEAT = 5
+THRESHOLD = 0.10  # Flag medians that got more than 10% slower
+CORPUS_COUNT = 10000  # Logos written by the corpus command
+SCALING_COUNT = 1000  # Logos used by the scaling command
+STUDY_REPEAT = 3  # Timed encodes/decodes per logo and setting (best is kept)
+STUDY_ENCODE_BUDGET = 0.02  # Seconds per logo a recommended PNG preset may spend
+BORDER_CHECK_TRIALS = 300  # Random masks checked against the BFS flood fill
+REBUILD_RUNS = 3  # Pipeline runs on one copy by the rebuild check
+
+# name, width, height, background, shape
+CORPUS = [
+    ("small-white", 240, 96, "white", "text"),
+    ("medium-color", 1200, 480, "color", "text"),
+    ("square-transparent", 1024, 1024, "transparent", "icon"),
+    ("wide-noisy", 3000, 750, "noisy", "text"),
+    ("tall-color", 600, 1500, "color", "icon"),
+    ("large-white", 2400, 2400, "white", "icon"),
+]
+
+BACKGROUNDS = {
+    "white": (255, 255, 255, 255),
+    "color": (18, 52, 86, 255),
+    "transparent": (0, 0, 0, 0),
+    "noisy": (245, 245, 240, 255),
+}
+
+
+def synthetic_logo(width, height, background="white", shape="text", seed=0):
+    """Draw a deterministic logo-like RGBA image.
+
+    "text" logos are a row of glyph-like bars and rings (with enclosed
+    counters); "icon" logos are a ring with a polygon inside. "noisy"
+    backgrounds get low-amplitude noise like a re-saved JPEG.
+    """
+    rng = np.random.default_rng(seed)
+    image = Image.new("RGBA", (width, height), BACKGROUNDS[background])
+    draw = ImageDraw.Draw(image)
+    ink = (255, 200, 40, 255) if background == "color" else (25, 30, 45, 255)
+    unit = min(width, height)
+
+    if shape == "text":
+        glyphs = int(rng.integers(4, 9))
+        glyph_w = width * 0.8 / glyphs
+        top, bottom = height * 0.3, height * 0.7
+        for i in range(glyphs):
+            left = width * 0.1 + i * glyph_w
+            right = left + glyph_w * 0.7
+            if rng.random() < 0.5:
+                draw.ellipse((left, top, right, bottom), outline=ink,
+                             width=max(1, int(glyph_w * 0.15)))
+            else:
+                draw.rectangle((left, top, left + glyph_w * 0.2, bottom), fill=ink)
+                draw.rectangle((left, top, right, top + (bottom - top) * 0.2), fill=ink)
+    else:
+        cx, cy = width / 2, height / 2
+        radius = unit * 0.4
+        draw.ellipse((cx - radius, cy - radius, cx + radius, cy + radius),
+                     outline=ink, width=max(1, int(unit * 0.06)))
+        sides = int(rng.integers(3, 7))
+        angles = np.linspace(0, 2 * np.pi, sides, endpoint=False) + rng.random()
+        draw.polygon([(cx + radius * 0.5 * np.cos(a), cy + radius * 0.5 * np.sin(a))
+                      for a in angles], fill=ink)
+
+    if background == "noisy":
+        data = np.asarray(image).astype(np.int16)
+        data[..., :3] += rng.integers(-6, 7, size=data[..., :3].shape, dtype=np.int16)
+        image = Image.fromarray(np.clip(data, 0, 255).astype(np.uint8))
+    return image
+
+
+def mask_logo(mask):
+    """White background where ``mask`` is set, dark ink everywhere else."""
+    data = np.where(mask[..., None], np.uint8(255), np.array([30, 30, 40], dtype=np.uint8))
+    return Image.fromarray(data.astype(np.uint8)).convert("RGBA")
+
+
+def noisy_mask(width, height, background_share, seed=0):
+    """Background pixels scattered at random, like a dithered or noisy backdrop."""
+    return np.random.default_rng(seed).random((height, width)) < background_share
+
+
+def serpentine_mask(width, height):
+    """One corridor winding through every other row, open to the border once.
+
+    The worst case for flood fills that sweep rows and columns in turn:
+    every bend needs another pass.
+    """
+    mask = np.zeros((height, width), dtype=bool)
+    mask[1:-1:2, 1:-1] = True
+    for turn, row in enumerate(range(2, height - 2, 2)):
+        mask[row, width - 2 if turn % 2 == 0 else 1] = True
+    mask[0, 1] = True
+    return mask
+
+
+def background_cases(width, height):
+    """(name, image) inputs for the background benchmark."""
+    return [
+        ("text", synthetic_logo(width, height, "white", "text")),
+        ("icon", synthetic_logo(width, height, "white", "icon")),
+        ("noisy-60", mask_logo(noisy_mask(width, height, 0.6))),
+        ("noisy-70", mask_logo(noisy_mask(width, height, 0.7))),
+        ("serpentine", mask_logo(serpentine_mask(width, height))),
+    ]
+
+
+def benchmark_background_modes(size=(3840, 2160), repeat=3):
+    """Time global thresholding against the edge-connected flood fill.
+
+    The synthetic logos enclose white counters and ring interiors, which
+    only the flood fill keeps opaque; the noisy and serpentine masks are
+    the flood fill's hard cases.
+    """
+    width, height = size
+    report = []
+    for shape, image in background_cases(width, height):
+        row = {"shape": shape, "width": width, "height": height}
+        results = {}
+        for mode, connected in (("global", False), ("flood", True)):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[mode] = pl.make_background_transparent(image, connected)
+                best = min(best, time.perf_counter() - start)
+            row[f"{mode}_seconds"] = best
+        row["kept_pixels"] = int(np.count_nonzero(
+            np.asarray(results["flood"].getchannel('A'))) - np.count_nonzero(
+            np.asarray(results["global"].getchannel('A'))))
+        report.append(row)
+    return report
+
+
+def border_connected_reference(mask):
+    """Breadth-first search version of process_logos.border_connected."""
+    height, width = mask.shape
+    reached = np.zeros_like(mask)
+    queue = collections.deque(
+        (y, x) for y in range(height) for x in range(width)
+        if mask[y, x] and (y in (0, height - 1) or x in (0, width - 1)))
+    for y, x in queue:
+        reached[y, x] = True
+    while queue:
+        y, x = queue.popleft()
+        for ny, nx in ((y + 1, x), (y - 1, x), (y, x + 1), (y, x - 1)):
+            if 0 <= ny < height and 0 <= nx < width and mask[ny, nx] \
+                    and not reached[ny, nx]:
+                reached[ny, nx] = True
+                queue.append((ny, nx))
+    return reached
+
+
+def check_border_connected(trials=BORDER_CHECK_TRIALS, seed=0):
+    """Compare border_connected with the BFS reference on random masks.
+
+    Sizes and background shares are random, plus a serpentine; returns
+    the number of masks where the two disagree.
+    """
+    rng = np.random.default_rng(seed)
+    masks = [serpentine_mask(61, 40)]
+    for _ in range(trials):
+        height, width = (int(n) for n in rng.integers(1, 64, size=2))
+        masks.append(noisy_mask(width, height, rng.random(), seed=int(rng.integers(2**31))))
+    return sum(not np.array_equal(pl.border_connected(mask), border_connected_reference(mask))
+               for mask in masks)
+
+
+def cmd_background(args):
+    mismatches = check_border_connected()
+    if mismatches:
+        print(f"❌ border_connected disagrees with the BFS reference on {mismatches} masks")
+        return 1
+    print(f"✅ border_connected matches the BFS reference on {BORDER_CHECK_TRIALS + 1} masks")
+    for r in benchmark_background_modes(repeat=args.repeat):
+        print(f"📊 {r['shape']} {r['width']}x{r['height']}: "
+              f"global {r['global_seconds'] * 1000:.1f} ms, "
+              f"flood {r['flood_seconds'] * 1000:.1f} ms "
+              f"({r['flood_seconds'] / r['global_seconds']:.1f}x), "
+              f"{r['kept_pixels']} enclosed background pixels kept")
+    return 0
+
+
+# --- SYNTHETIC CORPUS ---
+
+SIZES = [(240, 96), (400, 400), (640, 160), (1200, 480), (1024, 1024),
+         (1600, 400), (900, 1600), (2400, 1200), (3000, 3000)]
+
+
+def _corpus_item(index, seed=0):
+    """Pick a deterministic (size, background, shape, format) for one logo."""
+    rng = np.random.default_rng([seed, index])
+    width, height = SIZES[int(rng.integers(len(SIZES)))]
+    background = ("white", "color", "transparent", "noisy")[int(rng.integers(4))]
+    shape = ("text", "icon")[int(rng.integers(2))]
+    formats = ("png", "webp") if background == "transparent" else ("png", "jpg", "webp")
+    return width, height, background, shape, formats[int(rng.integers(len(formats)))]
+
+
+def _write_corpus_item(args):
+    directory, index, seed = args
+    width, height, background, shape, ext = _corpus_item(index, seed)
+    image = synthetic_logo(width, height, background, shape, seed=seed * 1_000_003 + index)
+    path = os.path.join(directory, f"logo-{index:05d}-{shape}-{background}.{ext}")
+    if ext == "jpg":
+        image.convert("RGB").save(path, "JPEG", quality=90)
+    elif ext == "webp":
+        image.save(path, "WEBP", quality=90)
+    else:
+        image.save(path, "PNG")
+    return os.path.getsize(path)
+
+
+def generate_corpus(directory, count, seed=0, jobs=None):
+    """Write ``count`` synthetic logos (PNG/JPEG/WebP) into ``directory``.
+
+    Returns the total number of bytes written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        sizes = pool.map(_write_corpus_item,
+                         [(directory, i, seed) for i in range(count)],
+                         chunksize=max(1, count // ((jobs or os.cpu_count() or 1) * 8)))
+        return sum(sizes)
+
+
+def _time(func, repeat):
+    """Best-effort timing: one warm-up call, then ``repeat`` samples."""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(samples), "min_s": min(samples),
+            "runs": repeat}
+
+
+def run_benchmarks(repeat=REPEAT, only=None):
+    """Benchmark each stage on each corpus entry; returns {name: timings}."""
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="logo-bench-")
+    saved_dir = pl.LOGO_DIR
+    # Sources live outside LOGO_DIR so process_logo never overwrites them
+    pl.LOGO_DIR = os.path.join(workdir, "out")
+    os.makedirs(pl.LOGO_DIR)
+    try:
+        for name, width, height, background, shape in CORPUS:
+            source = synthetic_logo(width, height, background, shape)
+            transparent = pl.make_background_transparent(source)
+            standardized = pl.standardize_to_dark_content(transparent)
+            dark = pl.create_dark_mode_version_professional(standardized)
+            path = os.path.join(workdir, f"{name}.png")
+            source.save(path)
+
+            def quiet_process_logo():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    pl.process_logo(path)
+
+            cases = {
+                "make_background_transparent": lambda: pl.make_background_transparent(source),
+                "standardize_to_dark_content": lambda: pl.standardize_to_dark_content(transparent),
+                "create_dark_mode_version_professional":
+                    lambda: pl.create_dark_mode_version_professional(standardized),
+                "resize_and_pad": lambda: (pl.resize_and_pad(standardized),
+                                           pl.resize_and_pad(dark)),
+                "transform_light_dark": lambda: pl.transform_light_dark(source),
+                "process_logo": quiet_process_logo,
+            }
+            for stage, func in cases.items():
+                key = f"{stage}[{name}]"
+                if only and not any(pattern in key for pattern in only):
+                    continue
+                results[key] = _time(func, repeat)
+                print(f"   {key:<60} {results[key]['median_s'] * 1000:9.2f} ms")
+    finally:
+        pl.LOGO_DIR = saved_dir
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"runs": []}
+
+
+def save_history(path, history):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def find_run(history, ref):
+    """Look a run up by label, or by (negative) index into the history."""
+    runs = history["runs"]
+    for run in reversed(runs):
+        if run.get("label") == ref:
+            return run
+    try:
+        return runs[int(ref)]
+    except (ValueError, IndexError):
+        raise SystemExit(f"❌ No benchmark run matches {ref!r}")
+
+
+def compare_runs(baseline, current, threshold=THRESHOLD):
+    """Return rows of (name, baseline_s, current_s, ratio, regressed)."""
+    rows = []
+    for name, timings in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        ratio = timings["median_s"] / base["median_s"]
+        rows.append((name, base["median_s"], timings["median_s"], ratio,
+                     ratio > 1 + threshold))
+    return rows
+
+
+def cmd_run(args):
+    print(f"🏁 Benchmarking {len(CORPUS)} synthetic logos x {args.repeat} runs...")
+    results = run_benchmarks(args.repeat, args.only)
+    history = load_history(args.history)
+    history["runs"].append({
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    })
+    save_history(args.history, history)
+    print(f"📝 Run #{len(history['runs']) - 1} appended to {args.history}")
+
+
+def cmd_compare(args):
+    history = load_history(args.history)
+    if len(history["runs"]) < 2:
+        raise SystemExit("❌ Need at least two runs in the history to compare")
+    baseline = find_run(history, args.baseline)
+    current = find_run(history, args.current)
+    rows = compare_runs(baseline, current, args.threshold)
+
+    print(f"📊 {current.get('label') or current['timestamp']} vs "
+          f"{baseline.get('label') or baseline['timestamp']} "
+          f"(threshold +{args.threshold:.0%})")
+    for name, base, now, ratio, regressed in sorted(rows, key=lambda r: -r[3]):
+        marker = "🐢" if regressed else ("🚀" if ratio < 1 - args.threshold else "  ")
+        print(f"{marker} {name:<60} {base * 1000:9.2f} -> {now * 1000:9.2f} ms "
+              f"({ratio:5.2f}x)")
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} benchmark(s) slower than the baseline")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+def _run_pipeline(logo_dir, jobs):
+    """Run process_logos.py as a child process; returns (seconds, rusage)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(pl.__file__), "--logo-dir", logo_dir,
+         "--jobs", str(jobs), "--no-cache", "--no-manifest"],
+        stdout=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode:
+        raise SystemExit(f"❌ Pipeline failed with exit code {proc.returncode}")
+    return elapsed, usage
+
+
+def _maxrss_bytes(usage):
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+def measure_scaling(corpus_dir, worker_counts):
+    """Run the full pipeline on a fresh copy of the corpus per worker count."""
+    sources = [f for f in os.listdir(corpus_dir)
+               if f.lower().endswith((".png", ".jpg", ".jpeg", ".webp"))]
+    total_bytes = sum(os.path.getsize(os.path.join(corpus_dir, f)) for f in sources)
+    rows = []
+    for jobs in worker_counts:
+        # The pipeline writes <base>.png next to its sources, so every run
+        # starts from an untouched copy
+        run_dir = tempfile.mkdtemp(prefix="logo-scaling-")
+        try:
+            logo_dir = os.path.join(run_dir, "logos")
+            shutil.copytree(corpus_dir, logo_dir)
+            seconds, usage = _run_pipeline(logo_dir, jobs)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        rows.append({
+            "jobs": jobs,
+            "seconds": seconds,
+            "files_per_s": len(sources) / seconds,
+            "mb_per_s": total_bytes / 2**20 / seconds,
+            # Largest single process (the parent or one worker), not the sum
+            "peak_rss_bytes": _maxrss_bytes(usage),
+        })
+        rows[-1]["speedup"] = rows[0]["seconds"] / seconds
+        rows[-1]["efficiency"] = rows[-1]["speedup"] / jobs * worker_counts[0]
+        print(f"   jobs={jobs:<3} {seconds:8.2f} s {rows[-1]['files_per_s']:9.1f} files/s "
+              f"{rows[-1]['mb_per_s']:8.2f} MB/s  peak RSS "
+              f"{rows[-1]['peak_rss_bytes'] / 2**20:7.1f} MB  speedup "
+              f"{rows[-1]['speedup']:5.2f}x ({rows[-1]['efficiency']:.0%})")
+    return {"files": len(sources), "bytes": total_bytes, "runs": rows}
+
+
+def _default_worker_counts():
+    counts, jobs = [], 1
+    while jobs < (os.cpu_count() or 1):
+        counts.append(jobs)
+        jobs *= 2
+    return counts + [os.cpu_count() or 1]
+
+
+def cmd_corpus(args):
+    print(f"🏭 Writing {args.count} synthetic logos to {args.directory}...")
+    start = time.perf_counter()
+    total = generate_corpus(args.directory, args.count, args.seed)
+    print(f"✅ {total / 2**20:.1f} MB in {time.perf_counter() - start:.1f} s")
+
+
+def cmd_scaling(args):
+    corpus_dir = args.corpus
+    tmp_corpus = None
+    if not corpus_dir:
+        tmp_corpus = tempfile.mkdtemp(prefix="logo-corpus-")
+        corpus_dir = tmp_corpus
+        print(f"🏭 Generating {args.count} synthetic logos...")
+        generate_corpus(corpus_dir, args.count, args.seed)
+    try:
+        workers = args.workers or _default_worker_counts()
+        print(f"📈 Scaling {len(os.listdir(corpus_dir))} logos across "
+              f"{', '.join(map(str, workers))} workers...")
+        report = measure_scaling(corpus_dir, workers)
+    finally:
+        if tmp_corpus:
+            shutil.rmtree(tmp_corpus, ignore_errors=True)
+    report.update({
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "cpu_count": os.cpu_count(),
+    })
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Scaling report written to {args.output}")
+
+
+# --- REBUILD CHECK ---
+
+def _processed_sources(logo_dir, cwd):
+    """Run the pipeline once and return the sources it processed."""
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(pl.__file__), "--logo-dir", logo_dir,
+         "--dev", "--manifest-ts", ""],
+        cwd=cwd, capture_output=True, text=True)
+    if proc.returncode:
+        raise SystemExit(f"❌ Pipeline failed with exit code {proc.returncode}:\n"
+                         f"{proc.stderr}")
+    return re.findall(r"^--- Processing (.+) ---$", proc.stdout, re.MULTILINE)
+
+
+def check_rebuild(logo_dir, runs=REBUILD_RUNS):
+    """Run the pipeline ``runs`` times on one copy of ``logo_dir``.
+
+    Every run works on the same copy, so they share the rebuild cache it
+    keeps inside. Returns the processed sources per run; every run after
+    the first should process none.
+    """
+    run_dir = tempfile.mkdtemp(prefix="logo-rebuild-")
+    try:
+        copy = os.path.join(run_dir, "logos")
+        shutil.copytree(logo_dir, copy)
+        return [_processed_sources(copy, run_dir) for _ in range(runs)]
+    finally:
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def cmd_rebuild(args):
+    print(f"🔁 Running the pipeline {args.runs} times on a copy of {args.logo_dir}...")
+    processed = check_rebuild(args.logo_dir, args.runs)
+    for run, names in enumerate(processed, 1):
+        listed = f": {', '.join(names)}" if names and run > 1 else ""
+        print(f"   run {run}: {len(names)} sources processed{listed}")
+    if any(processed[1:]):
+        print("\n❌ Unchanged sources were processed again")
+        return 1
+    print("\n✅ Every rerun was fully cached")
+    return 0
+
+
+# --- ENCODER STUDY ---
+
+PNG_STRATEGIES = {"default": zlib.Z_DEFAULT_STRATEGY, "filtered": zlib.Z_FILTERED,
+                  "rle": zlib.Z_RLE, "fixed": zlib.Z_FIXED}
+# (light, dark) PNG color types, as --png-mode / --dark-png-mode
+PNG_MODES = [("rgba", "rgba"), ("rgba", "gray"), ("palette", "gray"),
+             ("palette", "alpha")]
+
+
+def study_settings():
+    """Every encoder setting in the study grid.
+
+    Returns dicts with the output ``format``, a setting ``name``, the
+    Pillow format and save ``params``, and optional PNG ``modes`` or
+    ``near_lossless`` preprocessing.
+    """
+    settings = []
+    for modes in PNG_MODES:
+        for level in (1, 6, 9):
+            for strategy, value in PNG_STRATEGIES.items():
+                settings.append({
+                    "format": "png", "pil_format": "PNG", "modes": modes,
+                    "name": f"png {modes[0]}/{modes[1]} level={level} {strategy}",
+                    "params": {"compress_level": level, "compress_type": value},
+                })
+    if features.check("webp"):
+        for method in (0, 4, 6):
+            settings.append({"format": "webp", "pil_format": "WEBP",
+                             "name": f"webp lossless method={method}",
+                             "params": {"lossless": True, "quality": 100, "method": method}})
+        settings.append({"format": "webp", "pil_format": "WEBP", "near_lossless": True,
+                         "name": f"webp near-lossless bits={pl.NEAR_LOSSLESS_BITS}",
+                         "params": {"lossless": True, "quality": 100, "method": 4}})
+        for quality in (80, 90, 95):
+            settings.append({"format": "webp", "pil_format": "WEBP",
+                             "name": f"webp lossy quality={quality}",
+                             "params": {"quality": quality, "method": 4,
+                                        "alpha_quality": 100}})
+    if features.check("avif"):
+        for quality in (60, 75, 90):
+            for speed in (4, 8):
+                settings.append({"format": "avif", "pil_format": "AVIF",
+                                 "name": f"avif quality={quality} speed={speed}",
+                                 "params": {"quality": quality, "speed": speed,
+                                            "subsampling": "4:4:4"}})
+    return settings
+
+
+def study_outputs(logo_dir):
+    """The processed (path, variant) PNG canvases found in ``logo_dir``."""
+    names = set(os.listdir(logo_dir))
+    saved_dir = pl.LOGO_DIR
+    pl.LOGO_DIR = logo_dir
+    try:
+        paths = {path for name in names if pl.is_source_file(name, names)
+                 for path in pl.output_paths(os.path.join(logo_dir, name))}
+    finally:
+        pl.LOGO_DIR = saved_dir
+    return sorted((path, "dark" if path.endswith("-dark.png") else "light")
+                  for path in paths if path.endswith(".png") and os.path.exists(path))
+
+
+def _prepare(image, variant, setting):
+    """Apply a setting's PNG color type or near-lossless rounding."""
+    if setting.get("near_lossless"):
+        return pl.quantize_near_lossless(image)
+    if "modes" not in setting:
+        return image
+    saved = pl.PNG_MODE, pl.DARK_PNG_MODE
+    pl.PNG_MODE, pl.DARK_PNG_MODE = setting["modes"]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return pl.reduce_png_mode(image, variant)
+    finally:
+        pl.PNG_MODE, pl.DARK_PNG_MODE = saved
+
+
+def _best_of(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def measure_encoding(image, variant, setting, repeat=STUDY_REPEAT):
+    """Encode/decode one canvas with one setting; returns a result row."""
+    prepared = _prepare(image, variant, setting)
+
+    def encode():
+        buffer = io.BytesIO()
+        prepared.save(buffer, setting["pil_format"], **setting["params"])
+        return buffer.getvalue()
+
+    def decode():
+        decoded = Image.open(io.BytesIO(data))
+        decoded.load()
+        return decoded
+
+    encode_s, data = _best_of(encode, repeat)
+    decode_s, decoded = _best_of(decode, repeat)
+    return {"bytes": len(data), "encode_s": encode_s, "decode_s": decode_s,
+            "rmse": pl.premultiplied_rmse(decoded, image)}
+
+
+def pareto_frontier(rows, keys=("bytes", "encode_s", "decode_s")):
+    """Rows no other row beats or ties on every key while beating on one."""
+    def dominates(a, b):
+        return (all(a[k] <= b[k] for k in keys)
+                and any(a[k] < b[k] for k in keys))
+    return [row for row in rows if not any(dominates(other, row) for other in rows)]
+
+
+def run_study(logo_dir, repeat=STUDY_REPEAT, max_rmse=None):
+    """Run every output in ``logo_dir`` through the study grid.
+
+    Returns per-logo rows, per-setting totals, the Pareto frontier per
+    format (settings within ``max_rmse`` only) and the recommended PNG
+    preset.
+    """
+    max_rmse = pl.PNG_MAX_RMSE if max_rmse is None else max_rmse
+    outputs = study_outputs(logo_dir)
+    if not outputs:
+        raise SystemExit(f"❌ No processed logos in {logo_dir}, run process_logos.py first")
+    settings = study_settings()
+    canvases = []
+    for path, variant in outputs:
+        with Image.open(path) as image:
+            canvases.append((os.path.basename(path), variant, image.convert("RGBA")))
+
+    logos, totals = [], []
+    for setting in settings:
+        rows = []
+        for name, variant, image in canvases:
+            row = measure_encoding(image, variant, setting, repeat)
+            rows.append(dict(row, logo=name, setting=setting["name"]))
+        logos.extend(rows)
+        totals.append({
+            "setting": setting["name"],
+            "format": setting["format"],
+            "params": dict(setting["params"]),
+            "modes": setting.get("modes"),
+            "bytes": sum(r["bytes"] for r in rows),
+            "encode_s": sum(r["encode_s"] for r in rows),
+            "decode_s": sum(r["decode_s"] for r in rows),
+            "max_rmse": max(r["rmse"] for r in rows),
+        })
+        print(f"   {setting['name']:<40} {totals[-1]['bytes'] / 1024:9.1f} KB "
+              f"enc {totals[-1]['encode_s'] * 1000:8.1f} ms "
+              f"dec {totals[-1]['decode_s'] * 1000:7.1f} ms "
+              f"rmse {totals[-1]['max_rmse']:5.2f}")
+
+    frontier = {}
+    for fmt in dict.fromkeys(t["format"] for t in totals):
+        usable = [t for t in totals if t["format"] == fmt and t["max_rmse"] <= max_rmse]
+        frontier[fmt] = sorted(pareto_frontier(usable), key=lambda t: t["bytes"])
+    budget = STUDY_ENCODE_BUDGET * len(canvases)
+    affordable = [t for t in frontier.get("png", []) if t["encode_s"] <= budget]
+    recommended = min(affordable, key=lambda t: t["bytes"]) if affordable else None
+    return {"logos": len(canvases), "max_rmse": max_rmse, "results": logos,
+            "settings": totals, "frontier": frontier, "recommended_png": recommended}
+
+
+def print_study(report):
+    for fmt, rows in report["frontier"].items():
+        print(f"\n🏆 {fmt} Pareto frontier (bytes / encode / decode, "
+              f"RMSE <= {report['max_rmse']}):")
+        for t in rows:
+            print(f"   {t['setting']:<40} {t['bytes'] / 1024:9.1f} KB "
+                  f"{t['encode_s'] / report['logos'] * 1000:7.2f} ms/logo enc "
+                  f"{t['decode_s'] / report['logos'] * 1000:6.2f} ms/logo dec")
+    best = report["recommended_png"]
+    if best is None:
+        print(f"\n⚠️  No PNG setting encodes within {STUDY_ENCODE_BUDGET * 1000:.0f} ms/logo")
+        return
+    level = best["params"]["compress_level"]
+    strategy = next(k for k, v in PNG_STRATEGIES.items()
+                    if v == best["params"]["compress_type"])
+    print(f"\n💡 Recommended PNG preset: {best['setting']}")
+    # optimize=True makes Pillow compress at level 9
+    print(f"   QUALITY_OPTIMIZE = {level == 9}  # compress_level={level}, "
+          f"zlib strategy {strategy}, --png-mode {best['modes'][0]} "
+          f"--dark-png-mode {best['modes'][1]}")
+
+
+def cmd_study(args):
+    print(f"🔬 Studying encoder settings on the logos in {args.logo_dir}...")
+    report = run_study(args.logo_dir, args.repeat, args.max_rmse)
+    print_study(report)
+    if args.output:
+        report.update({
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "pillow": PIL.__version__,
+        })
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Study report written to {args.output}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the logo pipeline.")
+    parser.add_argument("--history", default=HISTORY_PATH,
+                        help=f"JSON history file (default: {HISTORY_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the suite and append to the history")
+    run.add_argument("--repeat", type=int, default=REPEAT,
+                     help=f"timed samples per benchmark (default: {REPEAT})")
+    run.add_argument("--label", help="name this run, e.g. 'baseline'")
+    run.add_argument("--only", nargs="+", metavar="PATTERN",
+                     help="only run benchmarks whose name contains PATTERN")
+    run.set_defaults(func=cmd_run)
+
+    compare = commands.add_parser("compare", help="compare two runs from the history")
+    compare.add_argument("--baseline", default="-2",
+                         help="label or index of the baseline run (default: -2)")
+    compare.add_argument("--current", default="-1",
+                         help="label or index of the run to check (default: -1)")
+    compare.add_argument("--threshold", type=float, default=THRESHOLD,
+                         help=f"allowed slowdown as a fraction (default: {THRESHOLD})")
+    compare.set_defaults(func=cmd_compare)
+
+    background = commands.add_parser(
+        "background", help="check the flood fill against a BFS and time both "
+                           "background modes on synthetic 4K logos")
+    background.add_argument("--repeat", type=int, default=3,
+                            help="timed samples per mode (default: 3)")
+    background.set_defaults(func=cmd_background)
+
+    corpus = commands.add_parser("corpus", help="write a synthetic logo corpus")
+    corpus.add_argument("directory", help="output directory (used as LOGO_DIR)")
+    corpus.add_argument("--count", type=int, default=CORPUS_COUNT,
+                        help=f"number of logos (default: {CORPUS_COUNT})")
+    corpus.add_argument("--seed", type=int, default=0)
+    corpus.set_defaults(func=cmd_corpus)
+
+    scaling = commands.add_parser(
+        "scaling", help="run the full pipeline at several worker counts")
+    scaling.add_argument("--corpus", metavar="DIR",
+                         help="existing corpus (default: generate a temporary one)")
+    scaling.add_argument("--count", type=int, default=SCALING_COUNT,
+                         help=f"logos to generate (default: {SCALING_COUNT})")
+    scaling.add_argument("--seed", type=int, default=0)
+    scaling.add_argument("--workers", type=int, nargs="+", metavar="N",
+                         help="worker counts to try (default: 1, 2, 4, ... cores)")
+    scaling.add_argument("--output", metavar="FILE", help="write the report as JSON")
+    scaling.set_defaults(func=cmd_scaling)
+
+    rebuild = commands.add_parser(
+        "rebuild", help="check that rerunning on unchanged logos processes nothing")
+    rebuild.add_argument("--logo-dir", default=pl.LOGO_DIR, metavar="DIR",
+                         help=f"source logos to copy (default: {pl.LOGO_DIR})")
+    rebuild.add_argument("--runs", type=int, default=REBUILD_RUNS,
+                         help=f"pipeline runs on the copy (default: {REBUILD_RUNS})")
+    rebuild.set_defaults(func=cmd_rebuild)
+
+    study = commands.add_parser(
+        "study", help="compare encoder settings on the processed logos")
+    study.add_argument("--logo-dir", default=pl.LOGO_DIR, metavar="DIR",
+                       help=f"processed logos to study (default: {pl.LOGO_DIR})")
+    study.add_argument("--repeat", type=int, default=STUDY_REPEAT,
+                       help=f"timed encodes/decodes per logo (default: {STUDY_REPEAT})")
+    study.add_argument("--max-rmse", type=float, default=pl.PNG_MAX_RMSE,
+                       metavar="RMSE",
+                       help="largest premultiplied RMSE a setting may reach to be "
+                            f"on the frontier (default: {pl.PNG_MAX_RMSE})")
+    study.add_argument("--output", metavar="FILE", help="write the report as JSON")
+    study.set_defaults(func=cmd_study)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
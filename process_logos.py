@@ -6,44 +6,262 @@ Logo Master Processor V4 - World-Class Edition
 - Optimized for web display with proper content-to-canvas ratio
 """
 
+import argparse
+import base64
+import contextlib
+import csv
+import hashlib
+import io
+import json
+import math
 import os
-from PIL import Image, ImageEnhance
+import re
+import shutil
+import time
+import tracemalloc
+import zlib
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from PIL import Image, ImageColor, ImageEnhance, features
 import numpy as np
 
 # --- OPTIMIZED CONFIGURATION ---
-LOGO_DIR = "public/logos"
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))  # Relative rule/TS paths resolve here
+SITE_LOGO_DIR = os.path.join(REPO_ROOT, "public", "logos")  # The logos the TS modules describe
+LOGO_DIR = SITE_LOGO_DIR
 TARGET_WIDTH = 200
 TARGET_HEIGHT = 80
 PADDING = 3  # Dramatically reduced from 15px to 3px
+# name: (width, height, padding, alignment); "wide" writes the unsuffixed files
+CANVAS_PRESETS = {
+    "wide": (TARGET_WIDTH, TARGET_HEIGHT, PADDING, "center"),
+    "square": (96, 96, 6, "center"),
+    "compact": (120, 40, 2, "left"),
+}
+PRESETS = []  # Extra presets rendered next to "wide": <base>-square.png, ...
+FILL_COLORS = {  # Solid-color themes: the logo shape filled with one color
+    "brand": "#0D7E7F",
+    "charcoal": "#111111",
+    "ivory": "#F5F5F3",
+    "contrast": "#000000",
+}
+FILL_THEMES = []  # Names from FILL_COLORS written as <base>-<name>.png
+DENSITIES = [1]  # Pixel densities to write: <base>@2x.png, <base>@3x.png, ...
+WIDTH_LADDER = []  # Extra canvas widths to write: <base>-w384.png, ...
 QUALITY_OPTIMIZE = True
+CHUNKS_PER_WORKER = 4  # Batch mode: chunks handed to each worker process
+CACHE_NAME = ".logo-cache.json"  # Incremental rebuild manifest
+CACHE_PATH = os.path.join(REPO_ROOT, CACHE_NAME)  # Inside LOGO_DIR for other logo dirs
+DARK_FROM_RESIZED = True  # Build the dark variant from the resized light alpha
+DECODE_REDUCING_GAP = 3.0  # Decode at >= 3x the content size (0 = full size)
+BACKGROUND_MODE = "global"  # "global" threshold or edge-connected "flood"
+BACKGROUND_ESTIMATE = "border"  # "border" histogram or single "corner" pixel
+BORDER_MIN_SHARE = 0.5  # Border share the dominant color needs to count as background
+BORDER_MAX_TOLERANCE = 120  # Cap for the spread-widened tolerance
+AUTO_TRIM = True  # Crop to the visible content before the NumPy stages
+PROFILE_STAGES = False  # Record per-stage timings (set by --profile)
+OUTPUT_FORMATS = ["png"]  # PNG is always written; add "webp", "webp-near", "avif"
+NEAR_LOSSLESS_BITS = 2  # webp-near: RGB low bits dropped (max error 2 levels)
+AVIF_QUALITY = 90
+PNG_MODE = "rgba"  # Light PNGs: "rgba" or adaptive "palette" (8-bit + tRNS)
+DARK_PNG_MODE = "rgba"  # Dark PNGs: "rgba", "gray" (gray + alpha) or "alpha" (white + alpha)
+PNG_MAX_RMSE = 4.0  # Quality guard: premultiplied RMSE above this keeps RGBA
+PNG_SEARCH = False  # Search zlib levels/strategies and bit depths per PNG (--png-budget)
+PNG_SEARCH_BUDGET = 0.5  # Seconds each logo may spend in the search, across its PNGs
+PNG_SEARCH_THREADS = min(4, os.cpu_count() or 1)  # Encoder threads per process
+PNG_SEARCH_LEVELS = (9, 6)
+PNG_SEARCH_STRATEGIES = (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED, zlib.Z_RLE,
+                         zlib.Z_FIXED)
+ATLAS = False  # Also pack every light/dark output into one sprite sheet each
+ATLAS_NAME = "logos-atlas"  # <name>.png / <name>-dark.png / <name>.json in LOGO_DIR
+ATLAS_MAX_WIDTH = 1024  # Shelf width of the sprite sheets
+ATLAS_GAP = 2  # Transparent pixels between tiles so scaled tiles never bleed
+ATLAS_TS_PATH = "lib/logo-atlas.ts"  # Generated TypeScript copy of the manifest
+LOGO_URL_PREFIX = "/logos"  # URL LOGO_DIR is served from
+REFERENCES_PATH = "components/sections/references-section.tsx"  # Page whose logos --referenced builds
+MANIFEST = True  # Write <MANIFEST_NAME>.json listing every output after a run
+MANIFEST_NAME = "logos.manifest"
+MANIFEST_TS_PATH = "lib/logos.manifest.ts"  # Generated TypeScript copy of the manifest
+INLINE = False  # Also write INLINE_TS_PATH with small logos as data URIs
+INLINE_MAX_BYTES = 4096  # Files larger than this stay as separate requests
+INLINE_TS_PATH = "lib/logos.inline.ts"
+THEME_RULES_PATH = "logo-themes.json"  # Per-logo light/dark rules (optional file)
+THEME_RULES = {}  # Loaded from THEME_RULES_PATH by main()
+DEDUPE = True  # Process duplicate sources once and copy the outputs
+DUPLICATE_MAX_RMSE = 3.0  # Largest content RMSE (0-255) for visual duplicates
+NEAR_DUPLICATE_DISTANCE = 16  # dHash + pHash bits still reported as near-duplicates
+DUPLICATE_REPORT_LINES = 20  # Groups and near-duplicate pairs logged per run
+LQIP_REDUCE = 10  # Placeholder = canvas box-reduced by this factor (20x8 px)
+PIPELINE_VERSION = 5  # Bump whenever processing output changes
 
 
-def make_background_transparent(image):
-    """Make background transparent by using the color of the corner pixel."""
+def _background_tolerance(r, g, b):
+    """Tolerance used around the corner color (wider for white-ish corners)."""
+    return 80 if r > 215 and g > 215 and b > 215 else 40
+
+
+def corner_background(red, green, blue, alpha):
+    """Background estimate that trusts the top-left pixel alone."""
+    if alpha[0, 0] < 255:
+        return {"kind": "transparent"}
+    color = (int(red[0, 0]), int(green[0, 0]), int(blue[0, 0]))
+    return {"kind": "solid", "color": color,
+            "tolerance": _background_tolerance(*color)}
+
+
+def border_background(red, green, blue, alpha):
+    """Estimate the background from a histogram of all border pixels.
+
+    The border is sampled once (O(perimeter), not O(area)) and quantized to
+    16 levels per channel. The dominant bin plus its direct neighbours forms
+    the background cluster; its median is the color, and its spread widens
+    the usual tolerance. Returns a dict whose ``kind`` is ``"solid"``,
+    ``"transparent"`` (most of the border is already see-through) or
+    ``"mixed"`` (no color dominates, e.g. a photo or gradient).
+    """
+    def border(plane):
+        if plane.shape[0] < 3 or plane.shape[1] < 3:
+            return plane.ravel()
+        return np.concatenate((plane[0], plane[-1], plane[1:-1, 0], plane[1:-1, -1]))
+
+    edge_alpha = border(alpha)
+    opaque = edge_alpha == 255
+    if np.count_nonzero(opaque) < edge_alpha.size * BORDER_MIN_SHARE:
+        return {"kind": "transparent"}
+
+    pixels = np.stack([border(plane)[opaque] for plane in (red, green, blue)])
+    quantized = (pixels >> 4).astype(np.int16)
+    keys = (quantized[0] << 8) | (quantized[1] << 4) | quantized[2]
+    dominant = int(np.argmax(np.bincount(keys, minlength=4096)))
+    center = np.array([dominant >> 8, (dominant >> 4) & 15, dominant & 15],
+                      dtype=np.int16)[:, None]
+    cluster = np.all(np.abs(quantized - center) <= 1, axis=0)
+    share = float(np.count_nonzero(cluster) / edge_alpha.size)
+    if share < BORDER_MIN_SHARE:
+        return {"kind": "mixed", "share": share}
+
+    members = pixels[:, cluster].astype(np.int16)
+    color = tuple(int(c) for c in np.median(members, axis=1))
+    spread = np.abs(members - np.array(color, dtype=np.int16)[:, None]).max(axis=0)
+    tolerance = min(_background_tolerance(*color) + 2 * int(np.percentile(spread, 95)),
+                    BORDER_MAX_TOLERANCE)
+    return {"kind": "solid", "color": color, "tolerance": tolerance,
+            "share": share}
+
+
+BACKGROUND_ESTIMATORS = {"corner": corner_background, "border": border_background}
+
+
+def make_background_transparent(image, connected=False, estimate="corner"):
+    """Make background transparent by using the estimated background color.
+
+    ``estimate`` picks the estimator: the corner pixel (the historic
+    behaviour) or the border histogram. With ``connected`` only
+    background-colored regions that touch the image border are cleared,
+    so enclosed areas such as letter counters survive.
+    """
     image = image.convert("RGBA")
     data = np.array(image)
-    corner_pixel = data[0, 0]
+    red, green, blue = data[..., 0], data[..., 1], data[..., 2]
 
-    if corner_pixel[3] < 255:
+    background = BACKGROUND_ESTIMATORS[estimate](red, green, blue, data[..., 3])
+    if background["kind"] != "solid":
         return image
 
-    r, g, b, _ = corner_pixel
-    tolerance = 40
-    white_ish = r > 215 and g > 215 and b > 215
-
-    if white_ish:
-        tolerance = 80
-
-    red, green, blue, alpha = data.T
+    r, g, b = background["color"]
+    tolerance = background["tolerance"]
 
     is_background = (red >= r - tolerance) & (red <= r + tolerance) & \
                     (green >= g - tolerance) & (green <= g + tolerance) & \
                     (blue >= b - tolerance) & (blue <= b + tolerance)
 
+    if connected:
+        is_background = border_connected(is_background)
+
     data[..., -1][is_background] = 0
     return Image.fromarray(data)
 
 
+def row_runs(mask):
+    """Horizontal runs of True pixels as (row, start, end) arrays, end exclusive."""
+    edges = np.diff(mask.view(np.int8), axis=1, prepend=0, append=0)
+    # Row-major, so every row alternates start, end, start, end, ...
+    rows, columns = np.nonzero(edges)
+    return rows[::2], columns[::2], columns[1::2]
+
+
+def _overlapping_runs(rows, starts, ends, width):
+    """Pairs (upper, lower) of runs on adjacent rows that share a column.
+
+    Runs are sorted row-major and disjoint within a row, so the runs of
+    row r that overlap a run of row r + 1 form one index range, found with
+    two binary searches on keys row * (width + 1) + column.
+    """
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    above = (rows - 1) * stride
+    first = np.searchsorted(end_keys, above + starts, side="right")
+    stop = np.searchsorted(start_keys, above + ends, side="left")
+    counts = np.maximum(stop - first, 0)
+    lower = np.repeat(np.arange(rows.size), counts)
+    offsets = np.arange(lower.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(first, counts) + offsets, lower
+
+
+def _components(count, upper, lower):
+    """Union-find over run pairs; returns each run's component root.
+
+    Vectorized hook-and-compress: every pass hooks the larger of two
+    linked roots onto the smaller (any of them when several compete, which
+    still only ever points to a lower index, so no cycles), flattens the
+    trees by pointer jumping and drops the pairs that now share a root.
+    A component of n runs settles in O(log n) passes whatever its shape.
+    """
+    parent = np.arange(count)
+    while upper.size:
+        a, b = parent[upper], parent[lower]
+        linked = a != b
+        upper, lower, a, b = upper[linked], lower[linked], a[linked], b[linked]
+        parent[np.maximum(a, b)] = np.minimum(a, b)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+    return parent
+
+
+def border_connected(mask):
+    """Keep only the regions of ``mask`` that are 4-connected to the border.
+
+    Run-length connected-component labeling: runs are found per row,
+    vertically overlapping runs are linked, and a union-find over the
+    links labels the components. Everything is O(runs), so a noisy or
+    dithered background costs about as much as a clean one.
+    """
+    if not mask.size:
+        return mask
+    height, width = mask.shape
+    rows, starts, ends = row_runs(np.ascontiguousarray(mask, dtype=bool))
+    if not rows.size:
+        return np.zeros_like(mask)
+    roots = _components(rows.size, *_overlapping_runs(rows, starts, ends, width))
+    on_border = (rows == 0) | (rows == height - 1) | (starts == 0) | (ends == width)
+    reached = np.zeros(rows.size, dtype=bool)
+    reached[roots[on_border]] = True
+    keep = reached[roots]
+
+    # Paint the kept runs back with +1/-1 markers and a running sum; on a
+    # width + 1 stride no run's end shares a position with the next start
+    stride = width + 1
+    marks = np.zeros(height * stride, dtype=np.int8)
+    marks[rows[keep] * stride + starts[keep]] = 1
+    marks[rows[keep] * stride + ends[keep]] = -1
+    painted = np.cumsum(marks, dtype=np.int8).view(bool)
+    return np.ascontiguousarray(painted.reshape(height, stride)[:, :width])
+
+
 def standardize_to_dark_content(image):
     """Ensure the logo content (text/shape) is dark."""
     image = image.convert("RGBA")
@@ -86,86 +304,2244 @@ def create_dark_mode_version_professional(image):
     return white_logo
 
 
-def resize_and_pad(image):
-    """Resize image to fit within target dimensions with minimal padding."""
-    bg = Image.new('RGBA', (TARGET_WIDTH, TARGET_HEIGHT), (0, 0, 0, 0))
+def transform_light_dark(image, dark=True, trim=False, info=None):
+    """Fused transparent/standardize/dark-fill chain in a single pass.
+
+    Equivalent to running make_background_transparent,
+    standardize_to_dark_content and create_dark_mode_version_professional
+    in sequence, but converts to RGBA once and works in integer arithmetic
+    on contiguous channel planes. Returns the (light, dark) RGBA images;
+    dark is None when ``dark`` is False. With ``trim`` the images are
+    cropped to the content right after background removal, so the later
+    stages only touch content pixels. If ``info`` is a dict, the background
+    estimate is stored in it.
+    """
+    with stage("split"):
+        bands = list(image.convert("RGBA").split())
+        red, green, blue = (np.asarray(band) for band in bands[:3])
+        alpha = np.array(bands[3])
+
+    # Background removal: uint8 range tests against the estimated color
+    with stage("background"):
+        background = BACKGROUND_ESTIMATORS[BACKGROUND_ESTIMATE](
+            red, green, blue, alpha)
+        if info is not None:
+            info["background"] = background
+        if background["kind"] == "solid":
+            (r, g, b), tolerance = background["color"], background["tolerance"]
+            is_background = np.ones(alpha.shape, dtype=bool)
+            scratch = np.empty(alpha.shape, dtype=bool)
+            for plane, value in ((red, r), (green, g), (blue, b)):
+                np.greater_equal(plane, max(value - tolerance, 0), out=scratch)
+                is_background &= scratch
+                np.less_equal(plane, min(value + tolerance, 255), out=scratch)
+                is_background &= scratch
+            if BACKGROUND_MODE == "flood":
+                is_background = border_connected(is_background)
+            alpha[is_background] = 0
+            del is_background, scratch
+
+    if trim:
+        with stage("trim"):
+            box = alpha_bbox(alpha)
+            if box and box != (0, 0, alpha.shape[1], alpha.shape[0]):
+                left, upper, right, lower = box
+                red, green, blue = (plane[upper:lower, left:right]
+                                    for plane in (red, green, blue))
+                alpha = np.ascontiguousarray(alpha[upper:lower, left:right])
+                bands[:3] = [band.crop(box) for band in bands[:3]]
+
+    # Standardization: luma sum in integer space (weights x1000)
+    with stage("standardize"):
+        visible = alpha > 50
+        count = int(np.count_nonzero(visible))
+        if count:
+            luma_sum = sum(weight * int(np.sum(plane, where=visible, dtype=np.uint64))
+                           for weight, plane in ((299, red), (587, green), (114, blue)))
+            # Same test as standardize_to_dark_content: mean over all 3 channels
+            if luma_sum > 128 * 1000 * 3 * count:
+                red, green, blue = (np.array(plane) for plane in (red, green, blue))
+                _invert_and_enhance(red, green, blue, visible)
+                bands[:3] = [Image.fromarray(plane) for plane in (red, green, blue)]
+
+        bands[3] = Image.fromarray(alpha)
+        light = Image.merge("RGBA", bands)
+    if not dark:
+        return light, None
+    # Pasting white through the alpha mask yields (a, a, a, a) per pixel
+    with stage("dark_fill"):
+        dark = Image.merge("RGBA", [bands[3]] * 4)
+    return light, dark
+
+
+def alpha_bbox(alpha):
+    """Return the (left, upper, right, lower) box of non-transparent pixels.
+
+    Uses one row reduction over the whole mask and one column reduction
+    over the occupied rows only. Returns None for a fully transparent mask.
+    """
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if not rows.size:
+        return None
+    upper, lower = int(rows[0]), int(rows[-1]) + 1
+    cols = np.flatnonzero(alpha[upper:lower].any(axis=0))
+    return int(cols[0]), upper, int(cols[-1]) + 1, lower
+
+
+def trim_transparent(image):
+    """Crop an RGBA image to the bounding box of its visible content."""
+    box = alpha_bbox(np.asarray(image.getchannel('A')))
+    return image.crop(box) if box else image
+
+
+def _invert_and_enhance(red, green, blue, visible):
+    """Invert visible pixels and apply a 1.1 contrast boost, in place.
+
+    Mirrors ImageEnhance.Contrast(...).enhance(1.1) on the visible pixels
+    using uint16/int32 math; results agree with Pillow to within 1 LSB.
+    """
+    channels = [np.subtract(255, plane[visible], dtype=np.int32)
+                for plane in (red, green, blue)]
+    # Pillow's RGB -> L conversion, fixed point
+    luma = (channels[0] * 19595 + channels[1] * 38470 + channels[2] * 7471
+            + 0x8000) >> 16
+    mean = int(luma.mean() + 0.5)
+    for plane, channel in zip((red, green, blue), channels):
+        enhanced = np.floor_divide(11 * channel - mean, 10)
+        plane[visible] = np.clip(enhanced, 0, 255).astype(np.uint8)
+
+
+def compare_transform_chain(filepath, repeat=3):
+    """Measure the fused kernel against the three-step reference chain.
+
+    Returns timing, tracemalloc peak (NumPy and Python allocations) and the
+    largest per-channel difference between the two results.
+    """
+    def reference(image):
+        transparent = make_background_transparent(
+            image, connected=BACKGROUND_MODE == "flood",
+            estimate=BACKGROUND_ESTIMATE)
+        if AUTO_TRIM:
+            transparent = trim_transparent(transparent)
+        light = standardize_to_dark_content(transparent)
+        return light, create_dark_mode_version_professional(light)
+
+    def fused(image):
+        return transform_light_dark(image, trim=AUTO_TRIM)
+
+    image = Image.open(filepath)
+    image.load()
+    report = {"file": os.path.basename(filepath),
+              "pixels": image.size[0] * image.size[1]}
+    results = {}
+    for name, func in (("chain", reference), ("fused", fused)):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[name] = func(image)
+            best = min(best, time.perf_counter() - start)
+        tracemalloc.start()
+        func(image)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report[f"{name}_seconds"] = best
+        report[f"{name}_peak_bytes"] = peak
 
-    original_width, original_height = image.size
+    report["max_abs_diff"] = max(
+        int(np.abs(np.asarray(a, dtype=np.int16) - np.asarray(b, dtype=np.int16)).max())
+        for a, b in zip(results["chain"], results["fused"]))
+    return report
+
+
+def fit_geometry(size, canvas=None, padding=None, align="center"):
+    """Return (new_width, new_height, paste_x, paste_y) for a source size.
+
+    ``canvas`` and ``padding`` default to the 1x TARGET_WIDTH x
+    TARGET_HEIGHT canvas and PADDING. ``align`` is "center" or a side
+    ("left", "right", "top", "bottom") or corner ("top-left", ...) the
+    content is pushed against, keeping the padding.
+    """
+    canvas_width, canvas_height = canvas or (TARGET_WIDTH, TARGET_HEIGHT)
+    padding = PADDING if padding is None else padding
+    original_width, original_height = size
     # Use almost full canvas with minimal padding
-    scale_factor = min((TARGET_WIDTH - PADDING * 2) / original_width,
-                       (TARGET_HEIGHT - PADDING * 2) / original_height)
+    scale_factor = min((canvas_width - padding * 2) / original_width,
+                       (canvas_height - padding * 2) / original_height)
 
-    new_width = int(original_width * scale_factor)
-    new_height = int(original_height * scale_factor)
+    new_width = max(1, int(original_width * scale_factor))
+    new_height = max(1, int(original_height * scale_factor))
 
-    # Use LANCZOS for highest quality scaling
-    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    sides = align.split("-")
+    paste_x = (padding if "left" in sides else canvas_width - new_width - padding
+               if "right" in sides else (canvas_width - new_width) // 2)
+    paste_y = (padding if "top" in sides else canvas_height - new_height - padding
+               if "bottom" in sides else (canvas_height - new_height) // 2)
+    return new_width, new_height, paste_x, paste_y
+
+
+def preset_suffix(name):
+    return "" if name == "wide" else f"-{name}"
+
+
+def variant_canvases(preset=None):
+    """(suffix, (width, height), padding, align) of every output canvas.
+
+    For "wide" and each of PRESETS (or just ``preset``): the 1x canvas,
+    then DENSITIES as ``@2x``; "wide" also gets WIDTH_LADDER as ``-w384``.
+    Padding scales with the canvas, and ladder widths that repeat a
+    density canvas are dropped. The first entry is the 1x wide canvas.
+    """
+    variants = []
+    for name in [preset] if preset else ["wide", *PRESETS]:
+        width, height, padding, align = CANVAS_PRESETS[name]
+        scales = [("", 1)] + [(f"@{d:g}x", d) for d in sorted(set(DENSITIES)) if d != 1]
+        if name == "wide":
+            scales += [(f"-w{w}", w / width) for w in sorted(set(WIDTH_LADDER))]
+        known = set()
+        for suffix, scale in scales:
+            canvas = (round(width * scale), round(height * scale))
+            if canvas not in known:
+                known.add(canvas)
+                variants.append((preset_suffix(name) + suffix, canvas,
+                                 round(padding * scale), align))
+    return variants
+
+
+def largest_fit(size):
+    """The largest content size any output canvas needs, for decode sizing."""
+    return max((fit_geometry(size, canvas, padding)[:2]
+                for _, canvas, padding, _ in variant_canvases()), key=lambda wh: wh[0])
 
-    paste_x = (TARGET_WIDTH - new_width) // 2
-    paste_y = (TARGET_HEIGHT - new_height) // 2
 
+def pad_to_canvas(resized, geometry, canvas=None):
+    """Center an already resized image on the transparent target canvas."""
+    bg = Image.new('RGBA', canvas or (TARGET_WIDTH, TARGET_HEIGHT), (0, 0, 0, 0))
+    _, _, paste_x, paste_y = geometry
     bg.paste(resized, (paste_x, paste_y), resized)
     return bg
 
 
+def resize_and_pad(image, geometry=None):
+    """Resize image to fit within target dimensions with minimal padding."""
+    geometry = geometry or fit_geometry(image.size)
+    new_width, new_height, _, _ = geometry
+
+    # Use LANCZOS for highest quality scaling
+    resized = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return pad_to_canvas(resized, geometry)
+
+
+def resize_variants(light, dark=None):
+    """Resize to every output canvas, largest first, each from the last.
+
+    Each step shrinks the previous step's resized content instead of the
+    source, so the full-size image is resampled only once; geometry always
+    comes from the source size, so rounding never accumulates. Without a
+    full-size ``dark`` the dark variant is a white fill of the resized
+    light alpha, which matches resampling a full-size dark image without a
+    second LANCZOS pass. Returns {suffix: (light canvas, dark canvas)}.
+    """
+    outputs = {}
+    current_light, current_dark = light, dark
+    steps = [(suffix, canvas, fit_geometry(light.size, canvas, padding, align))
+             for suffix, canvas, padding, align in variant_canvases()]
+    # Presets differ in aspect ratio, so order by content size, not canvas
+    for suffix, canvas, geometry in sorted(steps, key=lambda step: -step[2][0]):
+        size = geometry[:2]
+        with stage("resize"):
+            current_light = current_light.resize(size, Image.Resampling.LANCZOS)
+            light_canvas = pad_to_canvas(current_light, geometry, canvas)
+
+        if dark is not None:
+            with stage("resize_dark"):
+                current_dark = current_dark.resize(size, Image.Resampling.LANCZOS)
+                dark_canvas = pad_to_canvas(current_dark, geometry, canvas)
+        else:
+            with stage("dark_fill"):
+                alpha = current_light.getchannel('A')
+                white = Image.new('L', size, 255)
+                resized_dark = Image.merge('RGBA', (white, white, white, alpha))
+                dark_canvas = pad_to_canvas(resized_dark, geometry, canvas)
+        outputs[suffix] = (light_canvas, dark_canvas)
+    # 1x wide first, as variant_canvases lists them
+    return {suffix: outputs[suffix] for suffix, _, _, _ in variant_canvases()}
+
+
+def fill_variants(alpha, colors):
+    """Solid-color RGBA canvases, one per color, from a single alpha mask.
+
+    All N canvases are written by one broadcast into an (N, H, W, 4)
+    array, so extra colors cost a memory fill each rather than another
+    full-resolution image and resize.
+    """
+    alpha = np.asarray(alpha)
+    rgb = np.array([ImageColor.getrgb(color)[:3] for color in colors],
+                   dtype=np.uint8).reshape(-1, 3)
+    planes = np.empty((len(colors), *alpha.shape, 4), dtype=np.uint8)
+    planes[..., :3] = rgb[:, None, None, :]
+    planes[..., 3] = alpha
+    return [Image.fromarray(plane) for plane in planes]
+
+
+def open_for_target(filepath, content_size=None):
+    """Open a logo, decoding oversized sources close to the target size.
+
+    JPEGs are decoded at a reduced DCT scale via draft mode; everything is
+    then pre-shrunk with an integer box reduce, always keeping at least
+    DECODE_REDUCING_GAP times the final content size for LANCZOS to work on.
+    ``content_size`` is the size of the logo content in source pixels when
+    it is already known to be smaller than the whole image. Returns the
+    image and the source's full size.
+    """
+    with stage("decode"):
+        return _open_for_target(filepath, content_size)
+
+
+def _open_for_target(filepath, content_size):
+    image = Image.open(filepath)
+    source_size = image.size
+    if not DECODE_REDUCING_GAP:
+        image.load()
+        return image, source_size
+
+    content_width, content_height = content_size or image.size
+    new_width, new_height = largest_fit((content_width, content_height))
+    max_shrink = min(content_width / (new_width * DECODE_REDUCING_GAP),
+                     content_height / (new_height * DECODE_REDUCING_GAP))
+    if max_shrink < 2:
+        image.load()
+        return image, source_size
+    needed = (math.ceil(image.size[0] / max_shrink),
+              math.ceil(image.size[1] / max_shrink))
+
+    if image.format == "JPEG":
+        image.draft(None, needed)
+
+    factor = min(image.size[0] // needed[0], image.size[1] // needed[1])
+    if factor > 1:
+        if image.mode not in ("L", "LA", "RGB", "RGBA"):
+            image = image.convert("RGBA")
+        image = image.reduce(factor)
+    image.load()
+    return image, source_size
+
+
+def decode_and_transform(filepath, info=None):
+    """Decode a source and return its standardized (light, dark) images.
+
+    When trimming reveals that the content is much smaller than the
+    canvas, the pre-shrunk decode may have kept too little resolution for
+    the content alone; the source is then decoded again for that content
+    size. ``info`` is passed through to transform_light_dark.
+    """
+    image, source_size = open_for_target(filepath)
+    light, dark = transform_light_dark(
+        image, dark=not DARK_FROM_RESIZED, trim=AUTO_TRIM, info=info)
+
+    if AUTO_TRIM and image.size != source_size:
+        new_width, new_height = largest_fit(light.size)
+        if light.size[0] < new_width * DECODE_REDUCING_GAP \
+                or light.size[1] < new_height * DECODE_REDUCING_GAP:
+            scale = source_size[0] / image.size[0]
+            content_size = (light.size[0] * scale, light.size[1] * scale)
+            image, _ = open_for_target(filepath, content_size)
+            light, dark = transform_light_dark(
+                image, dark=not DARK_FROM_RESIZED, trim=True, info=info)
+    return light, dark
+
+
+# --- THEME RULES ---
+#
+# Each logo's light and dark output follows a rule from THEME_RULES_PATH:
+#   "keep"  the processed light canvas as is
+#   "fill"  the shape filled with solid white (dark only, the default)
+#   a CSS filter such as "invert(1)" or "brightness(0.3) contrast(1.2)",
+#   baked into the processed light canvas
+#
+# Processing writes in place, so a filtered light canvas goes to
+# <base>-light.<ext> (LIGHT_THEMED_SUFFIX) and the source is left alone;
+# otherwise every rebuild would filter the previous result again.
+#
+# {"default": {"dark": "fill"}, "logos": {"avado": {"light": "...", "dark": "keep"}}}
+
+DEFAULT_THEME_RULES = {"light": "keep", "dark": "fill"}
+LIGHT_THEMED_SUFFIX = "-light"
+CSS_FILTER = re.compile(r"([a-z-]+)\(\s*([0-9.]+)(%?)\s*\)")
+
+
+def parse_css_filter(text):
+    """Parse a CSS filter list into [(function, amount)], raising ValueError."""
+    steps = []
+    for match in CSS_FILTER.finditer(text):
+        name, amount = match.group(1), float(match.group(2))
+        if name not in ("invert", "brightness", "contrast", "grayscale"):
+            raise ValueError(f"unsupported CSS filter function {name}()")
+        steps.append((name, amount / 100 if match.group(3) else amount))
+    if not steps or CSS_FILTER.sub("", text).strip():
+        raise ValueError(f"cannot parse CSS filter {text!r}")
+    return steps
+
+
+def css_filter_rgb(rgb, steps):
+    """Apply parsed CSS filter steps to straight (not premultiplied) RGB.
+
+    ``rgb`` is a float array in 0..1 with channels last; every step clamps,
+    as browsers do.
+    """
+    for name, amount in steps:
+        if name == "invert":
+            rgb = rgb * (1 - amount) + (1 - rgb) * amount
+        elif name == "brightness":
+            rgb = rgb * amount
+        elif name == "contrast":
+            rgb = (rgb - 0.5) * amount + 0.5
+        else:
+            luma = rgb @ np.array([0.2126, 0.7152, 0.0722])
+            rgb = rgb * (1 - min(amount, 1)) + luma[..., None] * min(amount, 1)
+        rgb = np.clip(rgb, 0, 1)
+    return rgb
+
+
+def apply_css_filter(image, text):
+    """Bake a CSS filter into an RGBA canvas, leaving alpha untouched."""
+    data = np.array(image.convert("RGBA"))
+    rgb = css_filter_rgb(data[..., :3] / 255.0, parse_css_filter(text))
+    data[..., :3] = np.rint(rgb * 255).astype(np.uint8)
+    return Image.fromarray(data)
+
+
+def load_theme_rules(path=None):
+    """Read and validate the theme rules file; a missing file means defaults.
+
+    Relative paths resolve against the repo root, like the generated
+    TypeScript modules.
+    """
+    path = THEME_RULES_PATH if path is None else path
+    if not path:
+        return {}
+    path = os.path.join(REPO_ROOT, path)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            rules = json.load(f)
+        for name, logo in [("default", rules.get("default", {})),
+                           *rules.get("logos", {}).items()]:
+            for variant, rule in logo.items():
+                if variant not in ("light", "dark"):
+                    raise ValueError(f"{name}: unknown variant {variant!r}")
+                if rule == "fill" and variant == "light":
+                    raise ValueError(f"{name}: 'fill' is a dark-only rule")
+                if rule not in ("keep", "fill"):
+                    parse_css_filter(rule)
+    except (OSError, ValueError, AttributeError) as e:
+        raise SystemExit(f"❌ Invalid theme rules in {path}: {e}")
+    return rules
+
+
+def theme_rule(name, variant):
+    """The rule for one output base name and variant."""
+    logo = THEME_RULES.get("logos", {}).get(name, {})
+    default = THEME_RULES.get("default", {})
+    return logo.get(variant, default.get(variant, DEFAULT_THEME_RULES[variant]))
+
+
+def apply_theme_rules(name, light, dark):
+    """Turn the processed light canvas and filled dark canvas into outputs."""
+    light_rule, dark_rule = theme_rule(name, "light"), theme_rule(name, "dark")
+    if dark_rule == "keep":
+        dark = light
+    elif dark_rule != "fill":
+        dark = apply_css_filter(light, dark_rule)
+    if light_rule != "keep":
+        light = apply_css_filter(light, light_rule)
+    return light, dark
+
+
+def recolor_svg(text, rule, fill="#ffffff"):
+    """Apply a dark theme rule to every paint color in SVG markup.
+
+    Colors in fill/stroke/stop-color attributes and style declarations
+    are rewritten ("fill" paints them all with ``fill``); elements without
+    a fill inherit one set on the root, since SVG's default fill is black.
+    """
+    if rule == "keep":
+        return text
+    steps = None if rule == "fill" else parse_css_filter(rule)
+
+    def convert(color):
+        try:
+            rgb = np.array(ImageColor.getrgb(color)[:3]) / 255.0
+        except ValueError:
+            return color  # none, currentColor, url(#gradient), ...
+        if steps is None:
+            rgb = np.array(ImageColor.getrgb(fill)[:3]) / 255.0
+        else:
+            rgb = css_filter_rgb(rgb, steps)
+        return "#{:02x}{:02x}{:02x}".format(*np.rint(rgb * 255).astype(int))
+
+    paint = r"(?<![\w-])(fill|stroke|stop-color)"
+    text = re.sub(paint + r'(\s*=\s*")([^"]+)(")',
+                  lambda m: m.group(1) + m.group(2) + convert(m.group(3)) + m.group(4), text)
+    text = re.sub(paint + r"(\s*:\s*)([^;\"'}<]+)",
+                  lambda m: m.group(1) + m.group(2) + convert(m.group(3).strip()), text)
+    root = re.search(r"<svg\b[^>]*>", text)
+    if root and not re.search(r"\sfill\s*=", root.group(0)):
+        text = (text[:root.start()] + root.group(0)[:4] + f' fill="{convert("#000000")}"'
+                + text[root.start() + 4:])
+    return text
+
+
+def process_svg_logo(filepath):
+    """Write ``<base>-dark.svg`` next to an SVG source.
+
+    The light SVG is served as is, so light rules other than "keep" are
+    not applied to vector sources.
+    """
+    filename = os.path.basename(filepath)
+    print(f"--- Processing {filename} ---")
+    try:
+        light_path, dark_path = output_paths(filepath)
+        name = output_name(filepath)
+        if theme_rule(name, "light") != "keep":
+            print(f"⚠️  Light rule for {name} is not applied to SVG sources")
+        with open(filepath) as f:
+            text = f.read()
+        with stage("recolor_svg"):
+            dark = recolor_svg(text, theme_rule(name, "dark"))
+        with open(dark_path, "w") as f:
+            f.write(dark)
+        for fill in FILL_THEMES:
+            with open(fill_path(filepath, fill), "w") as f:
+                f.write(recolor_svg(text, "fill", FILL_COLORS[fill]))
+        print(f"✅ Success: Saved {os.path.basename(dark_path)}")
+        return {}
+    except Exception as e:
+        print(f"❌ Error processing {filename}: {e}")
+        return None
+
+
+# name: (extension, Pillow format, save parameters)
+ENCODERS = {
+    "png": ("png", "PNG", {"compress_level": 1}),
+    "webp": ("webp", "WEBP", {"lossless": True, "quality": 100, "method": 4}),
+    "webp-near": ("webp", "WEBP", {"lossless": True, "quality": 100, "method": 4}),
+    "avif": ("avif", "AVIF", {"quality": AVIF_QUALITY, "subsampling": "4:4:4",
+                              "speed": 4}),
+}
+OUTPUT_EXTENSIONS = ("png", "webp", "avif")
+
+
+def available_formats(formats):
+    """Drop encoders this Pillow build lacks, warning about each one."""
+    usable = []
+    for fmt in formats:
+        if fmt == "avif" and not features.check("avif"):
+            print("⚠️  This Pillow build has no AVIF support, skipping avif output")
+            continue
+        if fmt.startswith("webp") and not features.check("webp"):
+            print(f"⚠️  This Pillow build has no WebP support, skipping {fmt} output")
+            continue
+        usable.append(fmt)
+    return usable
+
+
+def quantize_near_lossless(image, bits=None):
+    """Round RGB to multiples of 2**bits so lossless WebP compresses better.
+
+    This is what libwebp's near-lossless mode does (Pillow does not expose
+    it): a bounded per-channel error in exchange for far fewer distinct
+    colors. Alpha is left untouched.
+    """
+    bits = NEAR_LOSSLESS_BITS if bits is None else bits
+    if bits <= 0:
+        return image
+    data = np.array(image.convert("RGBA"))
+    rgb = data[..., :3].astype(np.uint16) + (1 << (bits - 1))
+    rgb &= ~np.uint16((1 << bits) - 1)
+    data[..., :3] = np.minimum(rgb, 255)
+    return Image.fromarray(data)
+
+
+def premultiplied_rmse(image, reference):
+    """RMSE between two RGBA images as seen composited (alpha-premultiplied)."""
+    def premultiply(img):
+        data = np.asarray(img.convert("RGBA"), dtype=np.float32)
+        return np.concatenate((data[..., :3] * data[..., 3:] / 255, data[..., 3:]), axis=-1)
+    return float(np.sqrt(np.mean((premultiply(image) - premultiply(reference)) ** 2)))
+
+
+def to_palette(image):
+    """8-bit indexed image with a per-entry alpha palette (PNG tRNS).
+
+    Exact when the canvas has at most 256 RGBA colors, otherwise an
+    adaptive octree palette.
+    """
+    data = np.asarray(image.convert("RGBA"))
+    colors, indices = np.unique(data.reshape(-1, 4).view(np.uint32),
+                                return_inverse=True)
+    if len(colors) > 256:
+        return image.quantize(256, method=Image.Quantize.FASTOCTREE)
+    paletted = Image.fromarray(indices.reshape(data.shape[:2]).astype(np.uint8))
+    paletted.putpalette(colors.view(np.uint8).tobytes(), rawmode="RGBA")
+    return paletted
+
+
+def to_white_alpha(image):
+    """Alpha-only rendering: constant white plus a single coverage channel.
+
+    The coverage is the canvas' premultiplied luminance, so the logo looks
+    the same as before over a black background.
+    """
+    data = np.asarray(image.convert("RGBA")).astype(np.uint32)
+    luma = (data[..., 0] * 299 + data[..., 1] * 587 + data[..., 2] * 114) // 1000
+    coverage = ((luma * data[..., 3] + 127) // 255).astype(np.uint8)
+    return Image.merge("LA", (Image.new("L", image.size, 255), Image.fromarray(coverage)))
+
+
+def fill_to_palette(image):
+    """Exact palette for a single-color canvas: one entry per alpha level."""
+    data = np.asarray(image)
+    alpha = data[..., 3]
+    levels = np.flatnonzero(np.bincount(alpha.ravel(), minlength=256))
+    lut = np.zeros(256, dtype=np.uint8)
+    lut[levels] = np.arange(len(levels))
+    paletted = Image.fromarray(lut[alpha])
+    palette = np.empty((len(levels), 4), dtype=np.uint8)
+    palette[:, :3] = data[0, 0, :3]
+    palette[:, 3] = levels
+    paletted.putpalette(palette.tobytes(), rawmode="RGBA")
+    return paletted
+
+
+def reduce_png_mode(image, variant):
+    """Pick the smallest PNG color type allowed for a light, dark or fill canvas.
+
+    Lossless reductions (gray + alpha for a pure gray dark canvas) are
+    always taken; lossy ones (palette, alpha-only) only while their
+    premultiplied RMSE stays within PNG_MAX_RMSE, otherwise RGBA is kept.
+    """
+    if variant == "fill":
+        return fill_to_palette(image)
+    mode = PNG_MODE if variant == "light" else DARK_PNG_MODE
+    if mode == "rgba":
+        return image
+    if mode == "gray":
+        data = np.asarray(image)
+        if (data[..., 0] == data[..., 1]).all() and (data[..., 0] == data[..., 2]).all():
+            return image.convert("LA")
+        return image
+    candidate = to_palette(image) if mode == "palette" else to_white_alpha(image)
+    if premultiplied_rmse(candidate, image) > PNG_MAX_RMSE:
+        print(f"   ↩️  {mode} {variant} PNG exceeds the error budget, kept RGBA")
+        return image
+    return candidate
+
+
+def png_depth_candidates(image):
+    """Lossless (image, extra save parameters) renderings of a PNG canvas.
+
+    Besides the canvas itself: RGB/L when fully opaque, gray when R=G=B,
+    an exact palette when at most 256 colors are used, and 1/2/4-bit
+    palettes when the used indices fit.
+    """
+    candidates = [(image, {})]
+    if image.mode != "P":
+        data = np.asarray(image.convert("RGBA"))
+        opaque = bool((data[..., 3] == 255).all())
+        gray = bool((data[..., 0] == data[..., 1]).all()
+                    and (data[..., 1] == data[..., 2]).all())
+        if gray and image.mode != "L":
+            candidates.append((image.convert("L" if opaque else "LA"), {}))
+        elif opaque and image.mode == "RGBA":
+            candidates.append((image.convert("RGB"), {}))
+        if len(np.unique(data.reshape(-1, 4).view(np.uint32))) <= 256:
+            candidates.append((to_palette(image), {}))
+    for paletted, _ in [c for c in candidates if c[0].mode == "P"]:
+        used = int(np.asarray(paletted).max()) + 1
+        for bits in (1, 2, 4):
+            if used <= 1 << bits:
+                candidates.append((paletted, {"bits": bits}))
+                break
+    return candidates
+
+
+def _encode_png(image, params):
+    buffer = io.BytesIO()
+    # Image.save stashes its parameters on the image, so threads need copies
+    image.copy().save(buffer, "PNG", **params)
+    return buffer.getvalue()
+
+
+_png_search_deadline = None  # perf_counter() at which the current logo's search stops
+
+
+def search_png_encoding(image, deadline=None):
+    """Smallest PNG encoding of a canvas found before a deadline.
+
+    Every rendering from png_depth_candidates is encoded at each of
+    PNG_SEARCH_LEVELS x PNG_SEARCH_STRATEGIES on a thread pool (zlib
+    releases the GIL). The plain ``optimize`` encoding is made first so
+    there is always a result; a smaller one is only kept if it decodes
+    back to the same RGBA pixels. At most PNG_SEARCH_THREADS encodings run
+    at once and none start after ``deadline`` (default: the one
+    process_logo set for the current logo), so a search overruns it by at
+    most one encoding. Returns ``(data, params)``.
+    """
+    if deadline is None:
+        deadline = _png_search_deadline or time.perf_counter() + PNG_SEARCH_BUDGET
+    best_params = {"optimize": True}
+    best = _encode_png(image, best_params)
+    if time.perf_counter() >= deadline:
+        return best, best_params
+    reference = np.asarray(image.convert("RGBA"))
+    grid = iter([(candidate, dict(extra, compress_level=level, compress_type=strategy))
+                 for candidate, extra in png_depth_candidates(image)
+                 for level in PNG_SEARCH_LEVELS
+                 for strategy in PNG_SEARCH_STRATEGIES])
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=PNG_SEARCH_THREADS) as pool:
+        while True:
+            while len(running) < PNG_SEARCH_THREADS and time.perf_counter() < deadline:
+                item = next(grid, None)
+                if item is None:
+                    break
+                running[pool.submit(_encode_png, *item)] = item[1]
+            if not running:
+                return best, best_params
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                params = running.pop(future)
+                data = future.result()
+                if len(data) < len(best):
+                    decoded = np.asarray(Image.open(io.BytesIO(data)).convert("RGBA"))
+                    if np.array_equal(decoded, reference):
+                        best, best_params = data, params
+
+
+def save_output(image, path, fmt, variant="light"):
+    """Encode an RGBA canvas with one of the ENCODERS."""
+    _, pil_format, params = ENCODERS[fmt]
+    if fmt == "png":
+        params = dict(params, optimize=QUALITY_OPTIMIZE)
+        image = reduce_png_mode(image, variant)
+        if PNG_SEARCH:
+            data, _ = search_png_encoding(image)
+            with open(path, "wb") as f:
+                f.write(data)
+            return
+    elif fmt == "webp-near":
+        image = quantize_near_lossless(image)
+    image.save(path, pil_format, **params)
+
+
+def is_svg(filepath):
+    return filepath.lower().endswith(".svg")
+
+
+def output_paths(filepath, fmt="png", variant=""):
+    """Return the (light, dark) paths produced for a source logo.
+
+    ``variant`` is a suffix from variant_canvases ("" = 1x wide).
+    SVG sources stay vector: their outputs are SVGs whatever ``fmt`` is.
+    """
+    ext = "svg" if is_svg(filepath) else ENCODERS[fmt][0]
+    base_name = output_name(filepath)
+    light_name = base_name
+    if ext != "svg" and theme_rule(base_name, "light") != "keep":
+        light_name += LIGHT_THEMED_SUFFIX
+    light_path = os.path.join(LOGO_DIR, f"{light_name}{variant}.{ext}")
+    dark_path = os.path.join(LOGO_DIR, f"{base_name}-dark{variant}.{ext}")
+    return light_path, dark_path
+
+
+def output_name(filepath):
+    """The base name every output of a source starts with."""
+    return os.path.splitext(os.path.basename(filepath))[0].replace('-dark', '')
+
+
+def fill_path(filepath, name, fmt="png", variant=""):
+    """Path of a FILL_COLORS theme output, e.g. ``lisk-brand@2x.png``."""
+    ext = "svg" if is_svg(filepath) else ENCODERS[fmt][0]
+    return os.path.join(LOGO_DIR, f"{output_name(filepath)}-{name}{variant}.{ext}")
+
+
+def all_output_paths(filepath):
+    """Every file written for a source, across all OUTPUT_FORMATS and variants."""
+    if is_svg(filepath):
+        return [*output_paths(filepath), *(fill_path(filepath, n) for n in FILL_THEMES)]
+    return [path for fmt in OUTPUT_FORMATS for variant, _, _, _ in variant_canvases()
+            for path in [*output_paths(filepath, fmt, variant),
+                         *(fill_path(filepath, n, fmt, variant) for n in FILL_THEMES)]]
+
+
+SOURCE_PREFERENCE = (".svg", ".png", ".webp", ".jpg", ".jpeg")  # The site requests .svg/.png
+
+
+OUTPUT_SCALE = re.compile(r"(@\d+(\.\d+)?x|-w\d+)$")  # Density and width ladder suffixes
+
+
+def is_source_file(filename, names, written=()):
+    """Whether a LOGO_DIR entry is a source rather than one of our outputs.
+
+    ``written`` holds the output names the rebuild cache recorded, so the
+    outputs of earlier runs stay outputs whatever flags this run has (the
+    ``-brand`` files of a ``--fills brand`` run, say). Without a record,
+    any dark, light-themed, fill, preset, density or width suffix marks an
+    output, but only next to a source it could come from: ``acme-square.png``
+    stays a source unless there is an ``acme.png``, whatever the flags.
+    """
+    base, ext = os.path.splitext(filename)
+    ext = ext.lower()
+    if ext not in ('.png', '.jpg', '.jpeg', '.webp', '.svg'):
+        return False
+    if base == ATLAS_NAME or filename in written:
+        return False
+    if ext[1:] in OUTPUT_EXTENSIONS + ("svg",):
+        if base.endswith("-dark"):
+            return False  # Even alone: output_name drops "-dark" anyway
+        scale = OUTPUT_SCALE.search(base)
+        unscaled = base[:scale.start()] if scale else base
+        kinds = ("", "-dark", LIGHT_THEMED_SUFFIX, *(f"-{fill}" for fill in FILL_COLORS))
+        # Outputs are named <source name><kind><preset><scale>
+        for preset in map(preset_suffix, CANVAS_PRESETS):
+            stem = unscaled[:len(unscaled) - len(preset)]
+            if not unscaled.endswith(preset):
+                continue
+            for kind in kinds:
+                source = stem[:len(stem) - len(kind)]
+                if stem.endswith(kind) and source != base and any(
+                        f"{source}{dark}{source_ext}" in names
+                        for dark in ("", "-dark") for source_ext in SOURCE_PREFERENCE):
+                    return False
+    # <base>.webp next to <base>.png is the WebP copy of a processed logo
+    return not (ext == '.webp' and f"{base}.png" in names)
+
+
+def select_sources(filenames, cache=None):
+    """Keep one source per group of sources that write the same outputs.
+
+    ``proxeus.jpeg`` and ``proxeus.png`` collide, and so do ``near.jpg``
+    and the ``near.png`` a previous run wrote for it. The member the
+    rebuild cache knows wins, so a run never picks its own output up as a
+    new source; otherwise the first in SOURCE_PREFERENCE does. Returns
+    ``(selected, shadowed)`` file names.
+    """
+    cache = cache or {}
+    groups = {}
+    for filename in filenames:
+        light_path = output_paths(os.path.join(LOGO_DIR, filename))[0]
+        groups.setdefault(light_path, []).append(filename)
+    selected = []
+    for group in groups.values():
+        selected.append(min(group, key=lambda f: (
+            f not in cache, SOURCE_PREFERENCE.index(os.path.splitext(f)[1].lower()), f)))
+    return sorted(selected), sorted(set(filenames) - set(selected))
+
+
+def output_size_report(filepaths):
+    """Total bytes per output format over the given sources' outputs."""
+    report = {}
+    for fmt in OUTPUT_FORMATS:
+        sizes = [os.path.getsize(path) for filepath in filepaths
+                 for path in output_paths(filepath, fmt) if os.path.exists(path)]
+        report[fmt] = {"files": len(sizes), "bytes": sum(sizes)}
+    return report
+
+
+def print_size_report(report):
+    png_bytes = report.get("png", {}).get("bytes") or 0
+    print("\n📦 Output sizes:")
+    for fmt, values in report.items():
+        saving = ""
+        if png_bytes and fmt != "png":
+            saving = f"  ({values['bytes'] / png_bytes - 1:+.1%} vs PNG)"
+        print(f"   {fmt:<10} {values['files']:5d} files {values['bytes'] / 1024:10.1f} KB{saving}")
+
+
+def dominant_color(image):
+    """Most common visible color of an RGBA canvas as ``#rrggbb``.
+
+    Colors are binned at 4 bits per channel and weighted by alpha; the
+    result is the alpha-weighted mean of the winning bin, or None for a
+    fully transparent canvas.
+    """
+    data = np.asarray(image.convert("RGBA")).reshape(-1, 4)
+    data = data[data[:, 3] > 0]  # Logos are mostly transparent canvas
+    if not len(data):
+        return None
+    rgb = data[:, :3].astype(np.intp)
+    bins = (rgb[:, 0] >> 4 << 8) | (rgb[:, 1] >> 4 << 4) | (rgb[:, 2] >> 4)
+    weights = data[:, 3]
+    winner = np.bincount(bins, weights=weights).argmax()
+    members = bins == winner
+    color = np.average(rgb[members], axis=0, weights=weights[members])
+    return "#{:02x}{:02x}{:02x}".format(*np.rint(color).astype(int))
+
+
+def placeholder_data_uri(image, factor=None):
+    """A few-hundred-byte PNG data URI of the box-reduced canvas.
+
+    Browsers blur it when scaling it back up, which is all a lazy-load
+    placeholder needs.
+    """
+    factor = LQIP_REDUCE if factor is None else factor
+    tiny = image.reduce(factor) if factor > 1 else image
+    buffer = io.BytesIO()
+    tiny.save(buffer, "PNG", optimize=True)
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def logo_placeholders(light, dark):
+    """LQIP data URI and dominant color for each variant's final canvas.
+
+    Both come from one 2x box reduction of the canvas, which keeps the
+    pass to a fraction of a millisecond per variant.
+    """
+    placeholders = {}
+    for variant, image in (("light", light), ("dark", dark)):
+        half = image.reduce(2)
+        placeholders[variant] = {
+            "lqip": placeholder_data_uri(half, max(1, LQIP_REDUCE // 2)),
+            "color": dominant_color(half),
+        }
+    return placeholders
+
+
 def process_logo(filepath):
-    """Full processing pipeline for a single logo."""
+    """Full processing pipeline for a single logo.
+
+    Returns the logo's manifest metadata, or None if processing failed.
+    """
+    global _png_search_deadline
+    if is_svg(filepath):
+        return process_svg_logo(filepath)
     filename = os.path.basename(filepath)
     print(f"--- Processing {filename} ---")
 
     try:
-        image = Image.open(filepath)
+        info = {}
+        standardized_light_img, dark_mode_img = decode_and_transform(
+            filepath, info)
+        if info["background"]["kind"] == "mixed":
+            print(f"⚠️  No dominant border color in {filename}, background kept")
 
-        transparent_img = make_background_transparent(image)
-        standardized_light_img = standardize_to_dark_content(transparent_img)
-        dark_mode_img = create_dark_mode_version_professional(
-            standardized_light_img)
+        variants = resize_variants(
+            standardized_light_img, None if DARK_FROM_RESIZED else dark_mode_img)
 
-        final_light = resize_and_pad(standardized_light_img)
-        final_dark = resize_and_pad(dark_mode_img)
+        light_path, dark_path = output_paths(filepath)
+        name = output_name(filepath)
+        _png_search_deadline = time.perf_counter() + PNG_SEARCH_BUDGET
+        for variant, (final_light, final_dark) in variants.items():
+            alpha = final_light.getchannel("A")
+            with stage("theme"):
+                final_light, final_dark = apply_theme_rules(name, final_light, final_dark)
+            with stage("fill_themes"):
+                fills = dict(zip(FILL_THEMES, fill_variants(
+                    alpha, [FILL_COLORS[fill] for fill in FILL_THEMES])))
 
-        base_name = os.path.splitext(filename)[0].replace('-dark', '')
-        light_path = os.path.join(LOGO_DIR, f"{base_name}.png")
-        dark_path = os.path.join(LOGO_DIR, f"{base_name}-dark.png")
+            # Save with optimized settings for web
+            for fmt in OUTPUT_FORMATS:
+                suffix = "" if fmt == "png" else f"_{fmt}"
+                fmt_light, fmt_dark = output_paths(filepath, fmt, variant)
+                with stage(f"save_light{suffix}"):
+                    save_output(final_light, fmt_light, fmt, "light")
+                with stage(f"save_dark{suffix}"):
+                    save_output(final_dark, fmt_dark, fmt, "dark")
+                for fill, image in fills.items():
+                    with stage(f"save_fill{suffix}"):
+                        save_output(image, fill_path(filepath, fill, fmt, variant), fmt, "fill")
+            variants[variant] = final_light, final_dark
+        final_light, final_dark = variants[""]
 
-        # Save with optimized settings for web
-        final_light.save(light_path, "PNG",
-                         optimize=QUALITY_OPTIMIZE, compress_level=1)
-        final_dark.save(dark_path, "PNG",
-                        optimize=QUALITY_OPTIMIZE, compress_level=1)
+        with stage("placeholders"):
+            placeholders = logo_placeholders(final_light, final_dark)
 
         print(
             f"✅ Success: Saved {os.path.basename(light_path)} and {os.path.basename(dark_path)}")
+        if len(variants) > 1:
+            print(f"   Responsive variants: {', '.join(v for v in variants if v)}")
         print(
             f"   Content area: {TARGET_WIDTH-PADDING*2}x{TARGET_HEIGHT-PADDING*2} (padding: {PADDING}px)")
-        return True
+        return {"placeholders": placeholders}
 
     except Exception as e:
         print(f"❌ Error processing {filename}: {e}")
+        return None
+
+
+# --- SPRITE ATLAS ---
+
+def shelf_pack(sizes, max_width=None, gap=None):
+    """Place rectangles on shelves, tallest first.
+
+    Returns ``(positions, (width, height))`` with one ``(x, y)`` per size,
+    in input order. A shelf is as tall as its first (tallest) rectangle;
+    a new shelf starts when the next one no longer fits the width.
+    """
+    max_width = ATLAS_MAX_WIDTH if max_width is None else max_width
+    gap = ATLAS_GAP if gap is None else gap
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x and x + w > max_width:
+            x, y = 0, y + shelf_height + gap
+            shelf_height = 0
+        positions[i] = (x, y)
+        width = max(width, x + w)
+        shelf_height = max(shelf_height, h)
+        x += w + gap
+    return positions, (width, y + shelf_height)
+
+
+def atlas_paths(fmt="png"):
+    ext = ENCODERS[fmt][0]
+    return (os.path.join(LOGO_DIR, f"{ATLAS_NAME}.{ext}"),
+            os.path.join(LOGO_DIR, f"{ATLAS_NAME}-dark.{ext}"))
+
+
+def atlas_json_path():
+    return os.path.join(LOGO_DIR, f"{ATLAS_NAME}.json")
+
+
+def listed_logos(path):
+    """Names in the ``logos`` map of a written atlas or manifest, or None."""
+    try:
+        with open(path) as f:
+            return set(json.load(f)["logos"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def build_atlas(filepaths):
+    """Pack the light and dark PNG outputs of ``filepaths`` into two sheets.
+
+    Both sheets share one layout, so a single rectangle per logo addresses
+    either theme. Sheets are written in every OUTPUT_FORMATS format, and
+    the layout goes to ``<ATLAS_NAME>.json`` and ATLAS_TS_PATH.
+    Returns the manifest.
+    """
+    tiles = {}
+    for filepath in filepaths:
+        if is_svg(filepath):
+            continue
+        light_path, dark_path = output_paths(filepath)
+        name = output_name(filepath)
+        if name not in tiles and os.path.exists(light_path) and os.path.exists(dark_path):
+            with Image.open(light_path) as light, Image.open(dark_path) as dark:
+                tiles[name] = (light.convert("RGBA"), dark.convert("RGBA"))
+    names = sorted(tiles)
+    positions, size = shelf_pack([tiles[name][0].size for name in names])
+
+    manifest = {"width": size[0], "height": size[1], "images": {}, "logos": {}}
+    for index, variant in enumerate(("light", "dark")):
+        sheet = Image.new("RGBA", size, (0, 0, 0, 0))
+        for name, position in zip(names, positions):
+            sheet.paste(tiles[name][index], position)
+        for fmt in OUTPUT_FORMATS:
+            path = atlas_paths(fmt)[index]
+            save_output(sheet, path, fmt, variant)
+            manifest["images"].setdefault(variant, {})[fmt] = \
+                f"{LOGO_URL_PREFIX}/{os.path.basename(path)}"
+    for name, (x, y) in zip(names, positions):
+        width, height = tiles[name][0].size
+        manifest["logos"][name] = {"x": x, "y": y, "width": width, "height": height}
+
+    with open(atlas_json_path(), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    if ATLAS_TS_PATH:
+        write_atlas_ts(manifest, ATLAS_TS_PATH)
+    return manifest
+
+
+def print_atlas(manifest):
+    print(f"🧩 Atlas: {len(manifest['logos'])} logos on "
+          f"{manifest['width']}x{manifest['height']}px sheets -> "
+          f"{', '.join(os.path.basename(p) for p in atlas_paths())}")
+
+
+ATLAS_TS_TYPES = """export interface AtlasRect {
+  x: number;
+  y: number;
+  width: number;
+  height: number;
+}
+
+export interface LogoAtlas {
+  width: number;
+  height: number;
+  images: Record<"light" | "dark", Record<string, string>>;
+  logos: Record<string, AtlasRect>;
+}
+"""
+
+
+def write_atlas_ts(manifest, path):
+    write_ts_module(path, ["--atlas"], ATLAS_TS_TYPES, "logoAtlas", "LogoAtlas", manifest)
+
+
+def ts_module_path(path):
+    """Resolve a generated TypeScript path against the repo root.
+
+    Raises SystemExit when its directory does not exist, so a bad --*-ts
+    option fails up front instead of after processing.
+    """
+    path = os.path.join(REPO_ROOT, path)
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        raise SystemExit(f"❌ Cannot write {path}: {directory} does not exist "
+                         "(pass '' as its --*-ts option to skip it)")
+    return path
+
+
+def write_ts_module(path, flags, declarations, name, type_name, data):
+    """Write ``data`` as a typed, generated TypeScript constant."""
+    with open(ts_module_path(path), "w") as f:
+        f.write(f"// Generated by {' '.join(['process_logos.py', *flags])}, do not edit.\n\n"
+                f"{declarations}\n"
+                f"export const {name}: {type_name} = {json.dumps(data, indent=2)};\n")
+
+
+# --- LOGO MANIFEST ---
+
+MANIFEST_TS_TYPES = """export interface LogoBox {
+  x: number;
+  y: number;
+  width: number;
+  height: number;
+}
+
+export interface LogoFile {
+  src: string;
+  bytes: number;
+}
+
+export type LogoFormat = "png" | "webp" | "avif" | "svg";
+
+export interface LogoPlaceholder {
+  lqip: string;
+  color: string | null;
+}
+
+export interface LogoSrcset {
+  x: string;
+  w: string;
+}
+
+export interface LogoPreset {
+  width: number;
+  height: number;
+  variants: Partial<Record<"light" | "dark", Partial<Record<LogoFormat, LogoFile>>>>;
+}
+
+export interface LogoEntry {
+  width: number;
+  height: number;
+  bbox: LogoBox | null;
+  variants: Partial<Record<"light" | "dark", Partial<Record<LogoFormat, LogoFile>>>>;
+  placeholders?: Record<"light" | "dark", LogoPlaceholder>;
+  srcset?: Partial<Record<"light" | "dark", Partial<Record<LogoFormat, LogoSrcset>>>>;
+  presets?: Record<string, LogoPreset>;
+  fills?: Record<string, Partial<Record<LogoFormat, LogoFile>>>;
+}
+
+export interface LogoManifest {
+  logos: Record<string, LogoEntry>;
+}
+"""
+
+
+def svg_size(path):
+    """Intrinsic (width, height) of an SVG from its viewBox or attributes."""
+    with open(path) as f:
+        root = re.search(r"<svg\b[^>]*>", f.read())
+    attrs = dict(re.findall(r'([\w-]+)\s*=\s*"([^"]*)"', root.group(0) if root else ""))
+    if "viewBox" in attrs:
+        _, _, width, height = (float(v) for v in re.split(r"[\s,]+", attrs["viewBox"].strip()))
+    else:
+        width, height = (float(re.match(r"[0-9.]+", attrs.get(k, "0")).group())
+                         for k in ("width", "height"))
+    return round(width), round(height)
+
+
+def manifest_path():
+    return os.path.join(LOGO_DIR, f"{MANIFEST_NAME}.json")
+
+
+def build_manifest(filepaths, metadata=None):
+    """Describe every output of ``filepaths`` that exists on disk.
+
+    One entry per base name with its intrinsic size, the content bounding
+    box of the light PNG (None for SVG sources), and the URL and byte size
+    of each light/dark file in each OUTPUT_FORMATS format. ``metadata`` maps source file
+    names to what process_logo returned for them (placeholders).
+    """
+    metadata = metadata or {}
+    logos = {}
+    for filepath in filepaths:
+        light_path, _ = output_paths(filepath)
+        name = output_name(filepath)
+        # The last source sharing an output name is the one written last
+        extra = metadata.get(os.path.basename(filepath))
+        if name in logos and extra:
+            logos[name].update(extra)
+        if name in logos or not os.path.exists(light_path):
+            continue
+        if is_svg(filepath):
+            width, height = svg_size(light_path)
+            box = None
+        else:
+            with Image.open(light_path) as image:
+                alpha = np.asarray(image.convert("RGBA").getchannel("A"))
+            height, width = alpha.shape
+            box = alpha_bbox(alpha)
+        entry = {
+            "width": width,
+            "height": height,
+            "bbox": box and {"x": box[0], "y": box[1],
+                             "width": box[2] - box[0], "height": box[3] - box[1]},
+            "variants": {},
+            **(extra or {}),
+        }
+        for fmt in OUTPUT_FORMATS:
+            for variant, path in zip(("light", "dark"), output_paths(filepath, fmt)):
+                if os.path.exists(path):
+                    ext = os.path.splitext(path)[1][1:]
+                    entry["variants"].setdefault(variant, {})[ext] = {
+                        "src": f"{LOGO_URL_PREFIX}/{os.path.basename(path)}",
+                        "bytes": os.path.getsize(path),
+                    }
+        if not is_svg(filepath) and len(variant_canvases("wide")) > 1:
+            entry["srcset"] = responsive_srcsets(filepath)
+        if not is_svg(filepath) and PRESETS:
+            entry["presets"] = preset_entries(filepath)
+        if FILL_THEMES:
+            entry["fills"] = fill_entries(filepath)
+        logos[name] = entry
+    return {"logos": dict(sorted(logos.items()))}
+
+
+def responsive_srcsets(filepath):
+    """srcset strings per theme and format for a source's responsive files.
+
+    ``x`` lists the density variants (1x, 2x, ...); ``w`` lists every
+    canvas, ladder widths included, by pixel width for use with ``sizes``.
+    """
+    srcsets = {}
+    for fmt in OUTPUT_FORMATS:
+        ext = ENCODERS[fmt][0]
+        for index, theme in enumerate(("light", "dark")):
+            density, width = [], []
+            for suffix, canvas, _, _ in variant_canvases("wide"):
+                path = output_paths(filepath, fmt, suffix)[index]
+                if not os.path.exists(path):
+                    continue
+                url = f"{LOGO_URL_PREFIX}/{os.path.basename(path)}"
+                if not suffix.startswith("-w"):
+                    density.append(f"{url} {canvas[0] / TARGET_WIDTH:g}x")
+                width.append((canvas[0], f"{url} {canvas[0]}w"))
+            if width:
+                srcsets.setdefault(theme, {})[ext] = {
+                    "x": ", ".join(density),
+                    "w": ", ".join(entry for _, entry in sorted(width)),
+                }
+    return srcsets
+
+
+def preset_entries(filepath):
+    """Canvas size and 1x light/dark files of each extra canvas preset."""
+    presets = {}
+    for name in PRESETS:
+        width, height, _, _ = CANVAS_PRESETS[name]
+        preset = {"width": width, "height": height, "variants": {}}
+        for fmt in OUTPUT_FORMATS:
+            paths = output_paths(filepath, fmt, preset_suffix(name))
+            for theme, path in zip(("light", "dark"), paths):
+                if os.path.exists(path):
+                    preset["variants"].setdefault(theme, {})[ENCODERS[fmt][0]] = {
+                        "src": f"{LOGO_URL_PREFIX}/{os.path.basename(path)}",
+                        "bytes": os.path.getsize(path),
+                    }
+        presets[name] = preset
+    return presets
+
+
+def fill_entries(filepath):
+    """URL and byte size of each FILL_THEMES output per format."""
+    fills = {}
+    for fill in FILL_THEMES:
+        for fmt in OUTPUT_FORMATS:
+            path = fill_path(filepath, fill, fmt)
+            if os.path.exists(path):
+                fills.setdefault(fill, {})[os.path.splitext(path)[1][1:]] = {
+                    "src": f"{LOGO_URL_PREFIX}/{os.path.basename(path)}",
+                    "bytes": os.path.getsize(path),
+                }
+    return fills
+
+
+def write_manifest(manifest):
+    """Write the manifest JSON next to the logos and its TypeScript copy."""
+    with open(manifest_path(), "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    if MANIFEST_TS_PATH:
+        write_ts_module(MANIFEST_TS_PATH, [], MANIFEST_TS_TYPES, "logoManifest",
+                        "LogoManifest", manifest)
+    print(f"🗂️  Manifest: {len(manifest['logos'])} logos -> {os.path.basename(manifest_path())}")
+
+
+# --- INLINE DATA URIS ---
+
+MIME_TYPES = {"png": "image/png", "webp": "image/webp", "avif": "image/avif",
+              "svg": "image/svg+xml"}
+INLINE_TS_TYPES = """export type LogoTheme = "light" | "dark";
+"""
+
+
+def build_inline_logos(filepaths, max_bytes=None):
+    """Map base name -> theme -> data URI for outputs up to ``max_bytes``.
+
+    Each theme uses its smallest PNG or WebP file (AVIF is left out for
+    older Safari), or the SVG for vector sources; themes whose file is
+    larger stay out of the map.
+    """
+    max_bytes = INLINE_MAX_BYTES if max_bytes is None else max_bytes
+    formats = [fmt for fmt in OUTPUT_FORMATS if ENCODERS[fmt][0] in ("png", "webp")]
+    inline = {}
+    for filepath in filepaths:
+        name = output_name(filepath)
+        for index, theme in enumerate(("light", "dark")):
+            paths = [output_paths(filepath, fmt)[index] for fmt in formats]
+            paths = [path for path in paths if os.path.exists(path)]
+            if not paths:
+                continue
+            path = min(paths, key=os.path.getsize)
+            if os.path.getsize(path) > max_bytes:
+                continue
+            with open(path, "rb") as f:
+                payload = base64.b64encode(f.read()).decode("ascii")
+            mime = MIME_TYPES[os.path.splitext(path)[1][1:]]
+            inline.setdefault(name, {})[theme] = f"data:{mime};base64,{payload}"
+    return dict(sorted(inline.items()))
+
+
+def write_inline_logos(inline, path=None):
+    path = INLINE_TS_PATH if path is None else path
+    write_ts_module(path, ["--inline"], INLINE_TS_TYPES, "inlineLogos",
+                    "Record<string, Partial<Record<LogoTheme, string>>>", inline)
+    themes = sum(len(themes) for themes in inline.values())
+    print(f"📎 Inlined {themes} logo files up to {INLINE_MAX_BYTES} bytes -> {path}")
+
+
+# --- REFERENCED LOGOS ---
+
+REFERENCE_SRC = re.compile(r"""\bsrc:\s*["'`]([^"'`]+)["'`]""")
+
+
+def load_references(path):
+    """Logo names a page uses, in page order.
+
+    Reads the ``src: "<LOGO_URL_PREFIX>/<name>"`` entries of a TSX/TS
+    component, or a JSON list of names. Relative paths resolve against
+    the repo root.
+    """
+    path = os.path.join(REPO_ROOT, path)
+    try:
+        with open(path) as f:
+            text = f.read()
+        if path.endswith(".json"):
+            names = json.loads(text)
+            if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+                raise ValueError("expected a JSON list of logo names")
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ Cannot read references from {path}: {e}")
+    if not path.endswith(".json"):
+        prefix = LOGO_URL_PREFIX.rstrip("/") + "/"
+        names = [src[len(prefix):] for src in REFERENCE_SRC.findall(text)
+                 if src.startswith(prefix)]
+    names = [os.path.splitext(name)[0] if os.path.splitext(name)[1].lower()
+             in SOURCE_PREFERENCE else name for name in names]
+    return list(dict.fromkeys(names))
+
+
+def referenced_sources(references, sources):
+    """Pick one source per referenced name.
+
+    A name matches sources with the same stem; SVG wins, then the PNG the
+    site requests, so a stale download such as <name>.jpeg never
+    overwrites the curated <name>.png. Returns ``(selected, missing,
+    unreferenced)``.
+    """
+    by_name = {}
+    for filename in sources:
+        by_name.setdefault(os.path.splitext(filename)[0], []).append(filename)
+    selected, missing = [], []
+    for name in references:
+        candidates = sorted(by_name.get(name, []), key=lambda f: SOURCE_PREFERENCE.index(
+            os.path.splitext(f)[1].lower()))
+        if candidates:
+            selected.append(candidates[0])
+        else:
+            missing.append(name)
+    return sorted(selected), missing, sorted(set(sources) - set(selected))
+
+
+# --- DUPLICATE DETECTION ---
+
+HASH_SIZE = 8  # 64-bit dHash and pHash
+_DCT_SIZE = 32
+_DCT = np.cos(np.pi * (2 * np.arange(_DCT_SIZE)[None, :] + 1)
+              * np.arange(_DCT_SIZE)[:, None] / (2 * _DCT_SIZE))
+
+
+def _bits_to_int(bits):
+    return int("".join("1" if bit else "0" for bit in bits.ravel()), 2)
+
+
+def hash_content(filepath):
+    """Grayscale and RGB arrays of a source's content, for hashing.
+
+    Decodes a <=256 px thumbnail, flattens it on white and crops to the
+    pixels that differ from the border median, so a source and its
+    processed copy (different padding and size) hash alike.
+    """
+    with Image.open(filepath) as image:
+        image.draft("RGB", (256, 256))
+        image = image.convert("RGBA")
+    image.thumbnail((256, 256))
+    flat = Image.new("RGBA", image.size, (255, 255, 255, 255))
+    flat.alpha_composite(image)
+    rgb = np.asarray(flat.convert("RGB"), dtype=np.float32)
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    border = np.concatenate((gray[0], gray[-1], gray[:, 0], gray[:, -1]))
+    box = alpha_bbox(np.abs(gray - np.median(border)) > 24)
+    if box:
+        left, upper, right, lower = box
+        gray, rgb = gray[upper:lower, left:right], rgb[upper:lower, left:right]
+    return gray, rgb
+
+
+def dhash(gray):
+    """Difference hash: is each pixel of a 9x8 thumbnail brighter than its left neighbour."""
+    small = np.asarray(Image.fromarray(gray).resize((HASH_SIZE + 1, HASH_SIZE),
+                                                    Image.Resampling.BOX))
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray):
+    """DCT hash: low 8x8 frequencies of a 32x32 thumbnail against their median."""
+    small = np.asarray(Image.fromarray(gray).resize((_DCT_SIZE, _DCT_SIZE),
+                                                    Image.Resampling.BOX), dtype=np.float64)
+    low = (_DCT @ small @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+NEAR_DUPLICATE_BLOCK = 512  # Rows compared at once when searching near-duplicates
+
+
+def popcount(values):
+    """Set bits per element of a uint64 array."""
+    if hasattr(np, "bitwise_count"):  # NumPy >= 2.0
+        return np.bitwise_count(values)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1)
+
+
+def hash_source(filepath):
+    """Exact and perceptual fingerprints of one source.
+
+    SVGs only get a content hash; rasters also get dHash, pHash, the mean
+    content color and their pixel count.
+    """
+    with open(filepath, "rb") as f:
+        entry = {"sha256": hashlib.sha256(f.read()).hexdigest()}
+    if not is_svg(filepath):
+        try:
+            with Image.open(filepath) as image:
+                entry["pixels"] = image.size[0] * image.size[1]
+            gray, rgb = hash_content(filepath)
+            entry.update(dhash=dhash(gray), phash=phash(gray),
+                         color=rgb.reshape(-1, 3).mean(axis=0).tolist())
+        except OSError:
+            pass  # process_logo reports undecodable sources
+    return entry
+
+
+def hash_sources(filepaths, jobs=1):
+    """Fingerprint every source, across ``jobs`` worker processes."""
+    if jobs > 1 and len(filepaths) > 1:
+        chunksize = max(1, len(filepaths) // (jobs * CHUNKS_PER_WORKER))
+        with ProcessPoolExecutor(max_workers=min(jobs, len(filepaths))) as pool:
+            return dict(zip(filepaths, pool.map(hash_source, filepaths,
+                                                chunksize=chunksize)))
+    return {filepath: hash_source(filepath) for filepath in filepaths}
+
+
+def near_pairs(dhashes, phashes, max_distance):
+    """Index pairs (i < j) whose dHash + pHash distance is within ``max_distance``.
+
+    Each step compares NEAR_DUPLICATE_BLOCK hashes against every later one
+    with one vectorized XOR + popcount, instead of a Python loop per pair.
+    """
+    pairs = []
+    for start in range(0, len(dhashes), NEAR_DUPLICATE_BLOCK):
+        rows = slice(start, start + NEAR_DUPLICATE_BLOCK)
+        distance = (popcount(dhashes[rows, None] ^ dhashes[None, start:])
+                    + popcount(phashes[rows, None] ^ phashes[None, start:]))
+        i, j = np.nonzero(distance <= max_distance)
+        later = j > i  # Columns also start at ``start``: skip the diagonal and below
+        i, j = i[later], j[later]
+        pairs.extend(zip((i + start).tolist(), (j + start).tolist(),
+                         distance[i, j].tolist()))
+    return pairs
+
+
+def content_rmse(a, b):
+    """RMSE (0-255) between two (gray, rgb) hash_content crops.
+
+    The larger crop is resized to the smaller one, so a source and a
+    rescaled copy compare alike; crops whose aspect ratios differ by more
+    than 5% are never alike and give infinity.
+    """
+    (a_height, a_width), (b_height, b_width) = a[1].shape[:2], b[1].shape[:2]
+    if abs(math.log((a_width * b_height) / (a_height * b_width))) > math.log(1.05):
+        return math.inf
+    if a_width * a_height < b_width * b_height:
+        a, b = b, a
+    small = b[1]
+    large = Image.fromarray(a[1].astype(np.uint8)).resize(
+        (small.shape[1], small.shape[0]), Image.Resampling.BOX)
+    return float(np.sqrt(np.mean((np.asarray(large, dtype=np.float32) - small) ** 2)))
+
+
+def find_duplicates(hashes):
+    """Group duplicate sources and list the remaining near-duplicate pairs.
+
+    Duplicates are byte-identical files, or rasters whose hashes match
+    exactly and whose content thumbnails then agree within
+    DUPLICATE_MAX_RMSE, as equal 64-bit hashes alone also pair different
+    logos; both are found by bucketing on the key.
+    Logos with their own theme rules never join a group, since copied
+    outputs would carry another logo's rules. Each group lists its largest
+    source first, as that one is processed. Near-duplicates are pairs
+    within NEAR_DUPLICATE_DISTANCE that are not in the same group. Returns
+    ``(groups, [(a, b, distance)])``.
+    """
+    paths = list(hashes)
+    parent = list(range(len(paths)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    contents = {}
+
+    def same_pixels(a, b):
+        for i in (a, b):
+            if i not in contents:
+                contents[i] = hash_content(paths[i])
+        return content_rmse(contents[a], contents[b]) <= DUPLICATE_MAX_RMSE
+
+    own_rules = THEME_RULES.get("logos", {})
+    buckets = {}
+    for i, path in enumerate(paths):
+        if output_name(path) in own_rules:
+            continue
+        entry = hashes[path]
+        buckets.setdefault(("sha256", entry["sha256"]), []).append(i)
+        if "dhash" in entry:
+            buckets.setdefault(("hash", entry["dhash"], entry["phash"]), []).append(i)
+    for key, members in buckets.items():
+        if key[0] == "sha256":
+            for b in members[1:]:
+                parent[root(b)] = root(members[0])
+            continue
+        # Compare with the first member of each group, never along a chain
+        # of small differences
+        firsts = []
+        for b in members:
+            a = next((a for a in firsts if same_pixels(a, b)), None)
+            if a is None:
+                firsts.append(b)
+            else:
+                parent[root(b)] = root(a)
+
+    rasters = [i for i, path in enumerate(paths) if "dhash" in hashes[path]]
+    dhashes = np.array([hashes[paths[i]]["dhash"] for i in rasters], dtype=np.uint64)
+    phashes = np.array([hashes[paths[i]]["phash"] for i in rasters], dtype=np.uint64)
+    near = [(paths[rasters[a]], paths[rasters[b]], distance)
+            for a, b, distance in near_pairs(dhashes, phashes, NEAR_DUPLICATE_DISTANCE)
+            if root(rasters[a]) != root(rasters[b])]
+
+    groups = {}
+    for i, path in enumerate(paths):
+        groups.setdefault(root(i), []).append(path)
+    groups = [sorted(group, key=lambda p: (-hashes[p].get("pixels", 0), p))
+              for group in groups.values() if len(group) > 1]
+    return groups, near
+
+
+def print_duplicate_report(groups, near, limit=DUPLICATE_REPORT_LINES):
+    """Log up to ``limit`` duplicate groups and the ``limit`` closest pairs."""
+    for group in groups[:limit]:
+        names = ", ".join(os.path.basename(path) for path in group[1:])
+        reused = " (outputs reused)" if DEDUPE else ""
+        print(f"🪞 Duplicate of {os.path.basename(group[0])}: {names}{reused}")
+    for a, b, distance in sorted(near, key=lambda pair: pair[2])[:limit]:
+        print(f"🔍 Near-duplicate: {os.path.basename(a)} ~ {os.path.basename(b)} "
+              f"(distance {distance}/{2 * HASH_SIZE * HASH_SIZE})")
+    hidden = max(0, len(groups) - limit) + max(0, len(near) - limit)
+    if hidden:
+        print(f"   ... and {hidden} more, see --duplicate-report")
+
+
+def write_duplicate_report(path, hashes, groups, near):
+    report = {
+        "duplicates": [[os.path.basename(p) for p in group] for group in groups],
+        "near_duplicates": [{"a": os.path.basename(a), "b": os.path.basename(b),
+                             "distance": distance} for a, b, distance in near],
+        "hashes": {os.path.basename(p): {**h, **{k: f"{h[k]:016x}" for k in ("dhash", "phash")
+                                                  if k in h}}
+                   for p, h in hashes.items()},
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def reuse_outputs(source, duplicate):
+    """Copy every output of ``source`` to the matching output of ``duplicate``."""
+    for src, dst in zip(all_output_paths(source), all_output_paths(duplicate)):
+        if src != dst and os.path.exists(src):
+            shutil.copyfile(src, dst)
+
+
+# --- STAGE PROFILING ---
+
+_stage_timings = None  # {stage: timings} for the logo being profiled
+_stage_peaks = []  # Traced peak so far of each enclosing stage, innermost last
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Record wall time, CPU time and tracemalloc peak for a pipeline stage.
+
+    A no-op unless a logo is being profiled. Repeated stages (e.g. a second
+    decode) accumulate. The memory peak covers NumPy and Python allocations,
+    not Pillow's internal image buffers. Nested stages save the enclosing
+    stage's peak before resetting tracemalloc's and hand theirs back on
+    exit, so an outer peak always covers its inner ones.
+    """
+    if _stage_timings is None:
+        yield
+        return
+    base, outer_peak = tracemalloc.get_traced_memory()
+    if _stage_peaks:
+        _stage_peaks[-1] = max(_stage_peaks[-1], outer_peak)
+    tracemalloc.reset_peak()
+    _stage_peaks.append(base)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        peak = max(_stage_peaks.pop(), tracemalloc.get_traced_memory()[1])
+        if _stage_peaks:
+            _stage_peaks[-1] = max(_stage_peaks[-1], peak)
+        peak -= base
+        timings = _stage_timings.setdefault(
+            name, {"wall_s": 0.0, "cpu_s": 0.0, "peak_bytes": 0})
+        timings["wall_s"] += wall
+        timings["cpu_s"] += cpu
+        timings["peak_bytes"] = max(timings["peak_bytes"], peak)
+
+
+def process_logo_profiled(filepath):
+    """Run process_logo and return (metadata or None, stage timings or None)."""
+    global _stage_timings
+    if not PROFILE_STAGES:
+        return process_logo(filepath), None
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _stage_timings = {}
+    try:
+        with stage("total"):
+            result = process_logo(filepath)
+        return result, _stage_timings
+    finally:
+        _stage_timings = None
+
+
+def summarize_profile(records):
+    """Corpus-level percentiles per stage from (filename, timings) pairs."""
+    by_stage = {}
+    for _, timings in records:
+        for name, values in timings.items():
+            by_stage.setdefault(name, []).append(values)
+    summary = {}
+    for name, rows in by_stage.items():
+        summary[name] = {"count": len(rows)}
+        for metric in ("wall_s", "cpu_s", "peak_bytes"):
+            values = np.array([row[metric] for row in rows], dtype=float)
+            for q in (50, 90, 99):
+                summary[name][f"{metric}_p{q}"] = float(np.percentile(values, q))
+            summary[name][f"{metric}_max"] = float(values.max())
+            if metric != "peak_bytes":
+                summary[name][f"{metric}_total"] = float(values.sum())
+    return summary
+
+
+def write_profile_report(path, records):
+    """Write per-file stage timings plus corpus percentiles as JSON or CSV.
+
+    The CSV is long-form: one row per (scope, stage), where scope is a file
+    name or one of p50/p90/p99/max for the corpus summary.
+    """
+    summary = summarize_profile(records)
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["scope", "stage", "wall_s", "cpu_s", "peak_bytes"])
+            for filename, timings in records:
+                for name, values in timings.items():
+                    writer.writerow([filename, name, values["wall_s"],
+                                     values["cpu_s"], values["peak_bytes"]])
+            for scope in ("p50", "p90", "p99", "max"):
+                for name, values in summary.items():
+                    writer.writerow([scope, name, values[f"wall_s_{scope}"],
+                                     values[f"cpu_s_{scope}"],
+                                     values[f"peak_bytes_{scope}"]])
+    else:
+        with open(path, "w") as f:
+            json.dump({"files": [{"file": filename, "stages": timings}
+                                 for filename, timings in records],
+                       "summary": summary}, f, indent=2)
+    return summary
+
+
+def print_profile_summary(summary):
+    total = sum(values["wall_s_total"] for name, values in summary.items()
+                if name != "total") or 1.0
+    print(f"\n⏱️  {'stage':<12} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+          f"{'total s':>8} {'share':>6}")
+    for name, values in sorted(summary.items(),
+                               key=lambda item: -item[1]["wall_s_total"]):
+        share = "" if name == "total" else f"{values['wall_s_total'] / total:6.1%}"
+        print(f"   {name:<12} {values['wall_s_p50'] * 1000:8.2f} "
+              f"{values['wall_s_p90'] * 1000:8.2f} {values['wall_s_p99'] * 1000:8.2f} "
+              f"{values['wall_s_total']:8.3f} {share:>6}")
+
+
+# --- INCREMENTAL REBUILD CACHE ---
+
+def config_hash():
+    """Hash every setting that influences the emitted files."""
+    config = _worker_config()
+    del config["LOGO_DIR"]
+    del config["PNG_SEARCH_THREADS"]
+    config["PIPELINE_VERSION"] = PIPELINE_VERSION
+    payload = json.dumps(config, sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+def file_fingerprint(path, known=None):
+    """Return {"sha256", "size", "mtime_ns"} for a file.
+
+    When ``known`` has the same size and mtime the stored hash is reused,
+    so unchanged files are never read.
+    """
+    stat = os.stat(path)
+    if known and known.get("size") == stat.st_size \
+            and known.get("mtime_ns") == stat.st_mtime_ns:
+        return known
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"sha256": digest.hexdigest(), "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns}
+
+
+def load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache.get("entries", {})
+
+
+def save_cache(entries):
+    tmp_path = CACHE_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": 1, "entries": entries}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, CACHE_PATH)
+
+
+def is_up_to_date(filepath, entry, current_config):
+    """Check a source against its cache entry without decoding anything."""
+    if not entry or entry.get("config") != current_config:
+        return False
+    try:
+        source = file_fingerprint(filepath, entry["source"])
+        if source["sha256"] != entry["source"]["sha256"]:
+            return False
+        outputs = all_output_paths(filepath)
+        if len(outputs) != len(entry["outputs"]):
+            return False
+        for path, known in zip(outputs, entry["outputs"]):
+            if file_fingerprint(path, known)["sha256"] != known["sha256"]:
+                return False
+    except (OSError, KeyError, ValueError):
         return False
+    return True
+
+
+def cache_entry(filepath, current_config, metadata=None, previous=None):
+    """Fingerprint a freshly processed source and its outputs.
+
+    ``metadata`` from process_logo is kept so the manifest can still
+    describe the logo on runs that skip it. ``written`` adds the output
+    names to those of ``previous`` (the source's last entry) that are
+    still on disk, for is_source_file.
+    """
+    outputs = all_output_paths(filepath)
+    return {
+        "config": current_config,
+        "source": file_fingerprint(filepath),
+        "outputs": [file_fingerprint(path) for path in outputs],
+        "metadata": metadata or {},
+        "written": written_outputs(filepath, outputs, previous),
+    }
+
+
+def written_outputs(filepath, outputs=(), previous=None):
+    """Sorted output names a source has on disk, from ``outputs`` and ``previous``."""
+    written = {os.path.basename(path) for path in outputs}
+    written.update(name for name in (previous or {}).get("written", ())
+                   if os.path.exists(os.path.join(LOGO_DIR, name)))
+    written.discard(os.path.basename(filepath))  # A PNG source is rewritten in place
+    return sorted(written)
+
+
+def _process_logo_captured(filepath):
+    """Run process_logo in a worker and capture its log for ordered output."""
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        result, timings = process_logo_profiled(filepath)
+    return result, timings, buffer.getvalue()
+
+
+def _process_group(filepaths):
+    """Process logos that share an output path one after another."""
+    return [_process_logo_captured(filepath) for filepath in filepaths]
+
+
+def _init_worker(config, profile=False):
+    """Apply the parent's configuration inside a freshly spawned worker."""
+    global PROFILE_STAGES
+    globals().update(config)
+    PROFILE_STAGES = profile
 
 
-def main():
+def _worker_config():
+    return {
+        "LOGO_DIR": LOGO_DIR,
+        "TARGET_WIDTH": TARGET_WIDTH,
+        "TARGET_HEIGHT": TARGET_HEIGHT,
+        "PADDING": PADDING,
+        "CANVAS_PRESETS": CANVAS_PRESETS,
+        "PRESETS": PRESETS,
+        "FILL_COLORS": FILL_COLORS,
+        "FILL_THEMES": FILL_THEMES,
+        "DENSITIES": DENSITIES,
+        "WIDTH_LADDER": WIDTH_LADDER,
+        "QUALITY_OPTIMIZE": QUALITY_OPTIMIZE,
+        "DARK_FROM_RESIZED": DARK_FROM_RESIZED,
+        "DECODE_REDUCING_GAP": DECODE_REDUCING_GAP,
+        "AUTO_TRIM": AUTO_TRIM,
+        "BACKGROUND_MODE": BACKGROUND_MODE,
+        "BACKGROUND_ESTIMATE": BACKGROUND_ESTIMATE,
+        "BORDER_MIN_SHARE": BORDER_MIN_SHARE,
+        "BORDER_MAX_TOLERANCE": BORDER_MAX_TOLERANCE,
+        "OUTPUT_FORMATS": OUTPUT_FORMATS,
+        "NEAR_LOSSLESS_BITS": NEAR_LOSSLESS_BITS,
+        "AVIF_QUALITY": AVIF_QUALITY,
+        "PNG_MODE": PNG_MODE,
+        "DARK_PNG_MODE": DARK_PNG_MODE,
+        "PNG_MAX_RMSE": PNG_MAX_RMSE,
+        "PNG_SEARCH": PNG_SEARCH,
+        "PNG_SEARCH_BUDGET": PNG_SEARCH_BUDGET,
+        "PNG_SEARCH_THREADS": PNG_SEARCH_THREADS,
+        "THEME_RULES": THEME_RULES,
+    }
+
+
+def process_batch(filepaths, jobs):
+    """Process logos across a pool of worker processes.
+
+    Sources that write the same output (e.g. ``proxeus.jpeg`` and
+    ``proxeus.png``) are kept in one task so they never race. Results are
+    yielded in input order, so the log reads the same as a serial run
+    regardless of which worker finished first.
+    """
+    groups = {}
+    for index, filepath in enumerate(filepaths):
+        groups.setdefault(output_paths(filepath)[0], []).append(index)
+    tasks = list(groups.values())
+
+    jobs = min(jobs, len(tasks))
+    chunksize = max(1, len(tasks) // (jobs * CHUNKS_PER_WORKER))
+    pending = {}
+    next_index = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(_worker_config(), PROFILE_STAGES)) as pool:
+        task_files = [[filepaths[i] for i in indices] for indices in tasks]
+        for indices, results in zip(tasks, pool.map(_process_group, task_files,
+                                                    chunksize=chunksize)):
+            pending.update(zip(indices, results))
+            while next_index in pending:
+                result, timings, log = pending.pop(next_index)
+                print(log, end="")
+                yield result, timings
+                next_index += 1
+
+
+def positive(kind):
+    """argparse type: a finite ``kind`` (int or float) greater than zero."""
+    def convert(text):
+        value = kind(text)
+        if not 0 < value < math.inf:  # Also rejects nan
+            raise argparse.ArgumentTypeError(f"{text} is not a positive number")
+        return value
+    convert.__name__ = kind.__name__  # argparse names the type in its errors
+    return convert
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Standardize logos for web display.")
+    parser.add_argument("--logo-dir", default=SITE_LOGO_DIR, metavar="DIR",
+                        help="directory to process in place (default: the site's "
+                             "public/logos). Any other directory keeps its rebuild "
+                             f"cache inside it as {CACHE_NAME} and writes no "
+                             "TypeScript modules unless a --*-ts option names one")
+    parser.add_argument("--jobs", "-j", type=int, default=1, metavar="N",
+                        help="worker processes to use (0 = all cores, default: 1)")
+    parser.add_argument("--compare-kernel", nargs="+", metavar="FILE",
+                        help="benchmark the fused transform against the "
+                             "reference chain on FILE(s) and exit")
+    parser.add_argument("--full-res-dark", action="store_true",
+                        help="resample the dark variant from the full-size "
+                             "source instead of the resized light alpha")
+    parser.add_argument("--reducing-gap", type=float, default=DECODE_REDUCING_GAP,
+                        metavar="GAP",
+                        help="pre-shrink oversized sources while keeping GAP times "
+                             "the output size (0 = decode at full size, "
+                             f"default: {DECODE_REDUCING_GAP})")
+    parser.add_argument("--no-trim", action="store_true",
+                        help="keep the source whitespace instead of cropping "
+                             "to the visible content")
+    parser.add_argument("--background", choices=("global", "flood"),
+                        default=BACKGROUND_MODE,
+                        help="clear every background-colored pixel (global) or "
+                             "only regions connected to the border (flood)")
+    parser.add_argument("--background-estimate", choices=("border", "corner"),
+                        default=BACKGROUND_ESTIMATE,
+                        help="estimate the background from a border histogram "
+                             "or from the top-left pixel only")
+    parser.add_argument("--formats", nargs="+", default=[], metavar="FORMAT",
+                        choices=[fmt for fmt in ENCODERS if fmt != "png"],
+                        help="extra output formats next to PNG: webp (lossless), "
+                             "webp-near (near-lossless) and/or avif")
+    parser.add_argument("--png-mode", choices=("rgba", "palette"), default=PNG_MODE,
+                        help="light PNG color type (palette = 8-bit indexed "
+                             "with tRNS, guarded by --png-max-rmse)")
+    parser.add_argument("--dark-png-mode", choices=("rgba", "gray", "alpha"),
+                        default=DARK_PNG_MODE,
+                        help="dark PNG color type: gray + alpha (lossless) or "
+                             "white + alpha only (guarded by --png-max-rmse)")
+    parser.add_argument("--png-max-rmse", type=float, default=PNG_MAX_RMSE,
+                        metavar="RMSE",
+                        help="largest premultiplied RMSE a reduced PNG may have "
+                             f"before falling back to RGBA (default: {PNG_MAX_RMSE})")
+    parser.add_argument("--png-budget", type=float, nargs="?", default=0,
+                        const=PNG_SEARCH_BUDGET, metavar="SECONDS",
+                        help="release builds: search zlib levels, strategies and "
+                             "bit depths for the smallest PNGs, spending up to "
+                             "SECONDS per logo across all its PNG outputs (default "
+                             f"SECONDS: {PNG_SEARCH_BUDGET}). Off by default, as it "
+                             "adds up to SECONDS per raster logo (2-4x the run time)")
+    parser.add_argument("--dev", action="store_true",
+                        help="fast preset for local iteration: one quick zlib "
+                             "pass per PNG, no optimize and no encoding search")
+    parser.add_argument("--presets", nargs="+", default=PRESETS, metavar="NAME",
+                        choices=[name for name in CANVAS_PRESETS if name != "wide"],
+                        help="extra canvas presets to render next to wide: "
+                             + ", ".join(f"{name} ({w}x{h}, {p}px, {a})" for name, (w, h, p, a)
+                                         in CANVAS_PRESETS.items() if name != "wide"))
+    parser.add_argument("--fills", nargs="+", default=FILL_THEMES, metavar="NAME",
+                        choices=list(FILL_COLORS),
+                        help="solid-color themes to write as <base>-<NAME>.png: "
+                             + ", ".join(f"{name} ({color})" for name, color in FILL_COLORS.items()))
+    parser.add_argument("--densities", nargs="+", type=positive(float), default=DENSITIES,
+                        metavar="D",
+                        help="pixel densities to write, e.g. 1 2 3 for "
+                             "<base>@2x.png and <base>@3x.png (default: 1)")
+    parser.add_argument("--widths", nargs="+", type=positive(int), default=WIDTH_LADDER,
+                        metavar="PX",
+                        help="extra canvas widths to write as <base>-w<PX>.png, "
+                             "e.g. a next/image deviceSizes ladder")
+    parser.add_argument("--theme-rules", default=THEME_RULES_PATH, metavar="FILE",
+                        help="JSON file with per-logo light/dark rules "
+                             f"(default: {THEME_RULES_PATH})")
+    parser.add_argument("--atlas", action="store_true",
+                        help="also pack all light and all dark logos into one "
+                             f"sprite sheet each, with a {ATLAS_NAME}.json manifest")
+    parser.add_argument("--atlas-ts", metavar="FILE",
+                        help="where to write the TypeScript atlas manifest "
+                             "(relative to the repo root, '' to skip, "
+                             f"default: {ATLAS_TS_PATH} for the site's logos)")
+    parser.add_argument("--no-manifest", action="store_true",
+                        help=f"do not write {MANIFEST_NAME}.json and its "
+                             "TypeScript copy")
+    parser.add_argument("--manifest-ts", metavar="FILE",
+                        help="where to write the TypeScript manifest "
+                             "(relative to the repo root, '' to skip, "
+                             f"default: {MANIFEST_TS_PATH} for the site's logos)")
+    parser.add_argument("--inline", nargs="?", type=int, const=INLINE_MAX_BYTES,
+                        metavar="BYTES",
+                        help=f"write {INLINE_TS_PATH} with every logo file of at "
+                             "most BYTES as a base64 data URI "
+                             f"(default: {INLINE_MAX_BYTES})")
+    parser.add_argument("--inline-ts", metavar="FILE",
+                        help="where to write the inline module (relative to the "
+                             f"repo root, default: {INLINE_TS_PATH} for the site's logos)")
+    parser.add_argument("--referenced", nargs="?", const=REFERENCES_PATH, metavar="FILE",
+                        help="only build the logos FILE references as "
+                             f"src: \"{LOGO_URL_PREFIX}/<name>\" (or a JSON list of names), "
+                             f"default: {REFERENCES_PATH}")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="process duplicate sources separately instead of "
+                             "copying the outputs of the first one")
+    parser.add_argument("--duplicate-report", metavar="FILE",
+                        help="write source hashes, duplicate groups and "
+                             "near-duplicate pairs to FILE as JSON")
+    parser.add_argument("--profile", metavar="REPORT",
+                        help="record per-stage wall/CPU time and memory peaks "
+                             "and write them to REPORT (.json or .csv)")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocess every logo, ignoring the rebuild cache")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="neither read nor write the rebuild cache")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global LOGO_DIR, DARK_FROM_RESIZED, DECODE_REDUCING_GAP, AUTO_TRIM, \
+        BACKGROUND_MODE, BACKGROUND_ESTIMATE, PROFILE_STAGES, OUTPUT_FORMATS, \
+        PNG_MODE, DARK_PNG_MODE, PNG_MAX_RMSE, QUALITY_OPTIMIZE, PNG_SEARCH, \
+        PNG_SEARCH_BUDGET, PNG_SEARCH_THREADS, CACHE_PATH, ATLAS, ATLAS_TS_PATH, \
+        MANIFEST, MANIFEST_TS_PATH, INLINE, INLINE_MAX_BYTES, INLINE_TS_PATH, \
+        THEME_RULES, DENSITIES, WIDTH_LADDER, PRESETS, FILL_THEMES, DEDUPE
+    args = parse_args(argv)
+    LOGO_DIR = args.logo_dir
+    site_logos = os.path.realpath(LOGO_DIR) == os.path.realpath(SITE_LOGO_DIR)
+    if not site_logos:
+        # The cache is keyed by logo name and lib/ describes the site's
+        # logos, so another directory must touch neither
+        CACHE_PATH = os.path.join(LOGO_DIR, CACHE_NAME)
+        ATLAS_TS_PATH = MANIFEST_TS_PATH = INLINE_TS_PATH = ""
+    PNG_MODE, DARK_PNG_MODE = args.png_mode, args.dark_png_mode
+    PNG_MAX_RMSE = args.png_max_rmse
+    if "webp" in args.formats and "webp-near" in args.formats:
+        raise SystemExit("❌ webp and webp-near both write .webp files, pick one")
+    OUTPUT_FORMATS = ["png"] + available_formats(args.formats)
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.full_res_dark:
+        DARK_FROM_RESIZED = False
+    DECODE_REDUCING_GAP = args.reducing_gap
+    if args.no_trim:
+        AUTO_TRIM = False
+    BACKGROUND_MODE = args.background
+    BACKGROUND_ESTIMATE = args.background_estimate
+    PROFILE_STAGES = bool(args.profile)
+    PNG_SEARCH_BUDGET = args.png_budget
+    PNG_SEARCH = PNG_SEARCH_BUDGET > 0
+    if args.dev:
+        QUALITY_OPTIMIZE = PNG_SEARCH = False
+    ATLAS, MANIFEST = args.atlas, not args.no_manifest
+    if args.inline is not None:
+        INLINE, INLINE_MAX_BYTES = True, args.inline
+    if args.atlas_ts is not None:
+        ATLAS_TS_PATH = args.atlas_ts
+    if args.manifest_ts is not None:
+        MANIFEST_TS_PATH = args.manifest_ts
+    if args.inline_ts is not None:
+        INLINE_TS_PATH = args.inline_ts
+    if INLINE and not INLINE_TS_PATH:
+        print(f"⚠️  No --inline-ts for {LOGO_DIR}, skipping the inline module")
+        INLINE = False
+    for enabled, path in ((ATLAS, ATLAS_TS_PATH), (MANIFEST, MANIFEST_TS_PATH),
+                          (INLINE, INLINE_TS_PATH)):
+        if enabled and path:
+            ts_module_path(path)
+    THEME_RULES = load_theme_rules(args.theme_rules)
+    DENSITIES, WIDTH_LADDER = args.densities, args.widths
+    PRESETS = args.presets
+    FILL_THEMES = args.fills
+    DEDUPE = not args.no_dedupe
+    if jobs > 1:
+        # The worker processes already fill the cores
+        PNG_SEARCH_THREADS = max(1, (os.cpu_count() or 1) // jobs)
+
+    if args.compare_kernel:
+        for filepath in args.compare_kernel:
+            r = compare_transform_chain(filepath)
+            print(f"📊 {r['file']} ({r['pixels'] / 1e6:.1f} MP): "
+                  f"{r['chain_seconds'] * 1000:.1f} ms -> {r['fused_seconds'] * 1000:.1f} ms "
+                  f"({r['chain_seconds'] / r['fused_seconds']:.2f}x), "
+                  f"peak {r['chain_peak_bytes'] / 2**20:.1f} MB -> "
+                  f"{r['fused_peak_bytes'] / 2**20:.1f} MB, "
+                  f"max diff {r['max_abs_diff']}")
+        return
+
     print("🚀 Launching Logo Master Processor V4 - World-Class Edition...")
     print(
         f"📐 Target: {TARGET_WIDTH}x{TARGET_HEIGHT}px with {PADDING}px padding")
     print(f"🎯 Content area: {TARGET_WIDTH-PADDING*2}x{TARGET_HEIGHT-PADDING*2}px ({((TARGET_WIDTH-PADDING*2)*TARGET_HEIGHT-PADDING*2)/(TARGET_WIDTH*TARGET_HEIGHT)*100:.1f}% usage)")
 
-    files_to_process = [f for f in os.listdir(LOGO_DIR) if f.lower().endswith(
-        ('.png', '.jpg', '.jpeg', '.webp')) and not f.endswith('-dark.png')]
+    use_cache = not args.no_cache
+    cache = load_cache() if use_cache else {}
+    names = set(os.listdir(LOGO_DIR))
+    written = {name for entry in cache.values() for name in entry.get("written", ())}
+    sources = sorted(f for f in names if is_source_file(f, names, written))
+    # Sources that are gone keep the record of their leftover outputs
+    orphans = {name: {"written": written_outputs(name, previous=entry)}
+               for name, entry in cache.items() if name not in sources}
+    cache = {name: entry for name, entry in cache.items() if name in sources}
+    files_to_process, shadowed = select_sources(sources, cache)
+    if shadowed:
+        print(f"🔗 {len(shadowed)} files share outputs with another source, skipped: "
+              + ", ".join(shadowed))
+    if args.referenced:
+        references = load_references(args.referenced)
+        files_to_process, missing, unreferenced = referenced_sources(
+            references, files_to_process)
+        print(f"📋 {len(references)} logos referenced by {args.referenced}")
+        for name in missing:
+            print(f"⚠️  Referenced logo {name} has no source in {LOGO_DIR}")
+        if unreferenced:
+            print(f"📭 {len(unreferenced)} unreferenced sources skipped: "
+                  + ", ".join(unreferenced))
 
     if not files_to_process:
         print("No logos found to process.")
         return
 
+    filepaths = [os.path.join(LOGO_DIR, f) for f in files_to_process]
+    all_filepaths = filepaths
+
+    current_config = config_hash()
+    if use_cache and not args.force:
+        up_to_date = {path for path in filepaths if is_up_to_date(
+            path, cache.get(os.path.basename(path)), current_config)}
+        if up_to_date:
+            print(f"⏭️  Skipping {len(up_to_date)} up-to-date logos")
+            filepaths = [path for path in filepaths if path not in up_to_date]
+    metadata = {name: entry.get("metadata") for name, entry in cache.items()}
+
+    if not filepaths:
+        print("\n🎉 Nothing to do, all logos are up to date.")
+        # A cached working set can still differ from the last run's, e.g.
+        # after switching to --referenced
+        names = {output_name(path) for path in all_filepaths}
+        if ATLAS and (not all(os.path.exists(p) for p in atlas_paths())
+                      or listed_logos(atlas_json_path()) != {
+                          output_name(path) for path in all_filepaths if not is_svg(path)}):
+            print_atlas(build_atlas(all_filepaths))
+        if MANIFEST and listed_logos(manifest_path()) != names:
+            write_manifest(build_manifest(all_filepaths, metadata))
+        if INLINE:
+            write_inline_logos(build_inline_logos(all_filepaths))
+        return
+
+    duplicates = {}
+    if DEDUPE or args.duplicate_report:
+        hashes = hash_sources(filepaths, jobs)
+        groups, near = find_duplicates(hashes)
+        print_duplicate_report(groups, near)
+        if args.duplicate_report:
+            write_duplicate_report(args.duplicate_report, hashes, groups, near)
+        if DEDUPE:
+            duplicates = {dup: group[0] for group in groups for dup in group[1:]}
+    batch = [path for path in filepaths if path not in duplicates]
+
     success_count = 0
-    for filename in files_to_process:
-        if process_logo(os.path.join(LOGO_DIR, filename)):
-            success_count += 1
+    profile_records = []
+    while batch:
+        if jobs > 1 and len(batch) > 1:
+            print(f"⚙️  Batch mode: {min(jobs, len(batch))} workers")
+            results = process_batch(batch, jobs)
+        else:
+            results = map(process_logo_profiled, batch)
+        for filepath, (result, timings) in zip(batch, results):
+            name = os.path.basename(filepath)
+            if timings is not None:
+                profile_records.append((name, timings))
+            metadata[name] = result
+            if result is not None:
+                success_count += 1
+                if use_cache:
+                    cache[name] = cache_entry(filepath, current_config, result,
+                                              cache.get(name))
+            elif name in cache:
+                # Not up to date, but what earlier runs wrote is still theirs
+                cache[name] = {"written": written_outputs(filepath, previous=cache[name])}
+        # Duplicates of a source that failed are processed themselves
+        batch = [duplicate for duplicate, source in duplicates.items()
+                 if metadata[os.path.basename(source)] is None]
+        if batch:
+            print(f"🔁 Processing {len(batch)} duplicates of failed sources on their own")
+        for duplicate in batch:
+            del duplicates[duplicate]
+
+    for duplicate, source in duplicates.items():
+        name = os.path.basename(duplicate)
+        result = metadata[os.path.basename(source)]
+        metadata[name] = result
+        reuse_outputs(source, duplicate)
+        success_count += 1
+        if use_cache:
+            cache[name] = cache_entry(duplicate, current_config, result, cache.get(name))
+
+    if use_cache:
+        save_cache({**{name: entry for name, entry in orphans.items() if entry["written"]},
+                    **cache})
 
     print("\n🎉 Processing complete!")
     print(
-        f"Successfully processed {success_count}/{len(files_to_process)} logos.")
+        f"Successfully processed {success_count}/{len(filepaths)} logos.")
+
+    if ATLAS:
+        print_atlas(build_atlas(all_filepaths))
+    if MANIFEST:
+        write_manifest(build_manifest(all_filepaths, metadata))
+    if INLINE:
+        write_inline_logos(build_inline_logos(all_filepaths))
+
+    if len(OUTPUT_FORMATS) > 1:
+        print_size_report(output_size_report(all_filepaths))
+
+    if profile_records:
+        print_profile_summary(write_profile_report(args.profile, profile_records))
+        print(f"📝 Profile written to {args.profile}")
 
 
 if __name__ == "__main__":